@@ -1,13 +1,48 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Q
 from .models import (
     User, InvestmentPack, UserInvestment, Transaction,
-    ReferralPack, ReferralCommission, KYCVerification, Message
+    ReferralPack, ReferralCommission, ReferralAchievement, KYCVerification, Message
 )
+from .paginators import EstimatedCountPaginator
+from .search import search_ids
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables that grow without bound: estimated
+    counts, no second full-table count, and no date_hierarchy (its date
+    drill-down aggregates over the whole filtered table).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class IndexedSearchMixin:
+    """Answer the changelist search box from the full-text index (api/search.py)"""
+    search_kind = None
+    search_user_fields = []  # FKs whose users' usernames/emails also match
+    
+    def get_search_results(self, request, queryset, search_term):
+        try:
+            condition = Q(pk__in=search_ids(self.search_kind, search_term))
+            if self.search_user_fields:
+                user_ids = search_ids('user', search_term)
+                for field in self.search_user_fields:
+                    condition |= Q(**{f'{field}__in': user_ids})
+        except ValueError:
+            # Terms too short for the index
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(condition), False
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(IndexedSearchMixin, BaseUserAdmin):
+    search_kind = 'user'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    autocomplete_fields = ['referred_by']
     list_display = ['username', 'email', 'role', 'balance', 'is_verified', 'is_kyc_verified']
     list_filter = ['role', 'is_verified', 'is_kyc_verified', 'created_at']
     search_fields = ['username', 'email', 'referral_code']
@@ -24,6 +59,11 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('balance', 'referred_by', 'role', 'language')
         }),
     )
+    
+    def delete_queryset(self, request, queryset):
+        # One by one, so User.delete keeps the referral tree counts in step
+        for user in queryset:
+            user.delete()
 
 
 @admin.register(InvestmentPack)
@@ -34,19 +74,23 @@ class InvestmentPackAdmin(admin.ModelAdmin):
 
 
 @admin.register(UserInvestment)
-class UserInvestmentAdmin(admin.ModelAdmin):
+class UserInvestmentAdmin(LargeTableAdmin):
     list_display = ['user', 'pack', 'amount', 'start_date', 'end_date', 'status', 'total_return']
     list_filter = ['status', 'start_date', 'pack']
+    list_select_related = ['user', 'pack']
     search_fields = ['user__username', 'user__email']
-    date_hierarchy = 'start_date'
+    autocomplete_fields = ['user']
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(IndexedSearchMixin, LargeTableAdmin):
+    search_kind = 'transaction'
+    search_user_fields = ['user']
     list_display = ['user', 'type', 'amount', 'status', 'created_at']
     list_filter = ['type', 'status', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email', 'transaction_hash', 'wallet_address']
-    date_hierarchy = 'created_at'
+    autocomplete_fields = ['user']
 
 
 @admin.register(ReferralPack)
@@ -56,18 +100,31 @@ class ReferralPackAdmin(admin.ModelAdmin):
 
 
 @admin.register(ReferralCommission)
-class ReferralCommissionAdmin(admin.ModelAdmin):
+class ReferralCommissionAdmin(LargeTableAdmin):
     list_display = ['referrer', 'referred_user', 'amount', 'created_at']
     list_filter = ['created_at']
+    list_select_related = ['referrer', 'referred_user']
     search_fields = ['referrer__username', 'referred_user__username']
-    date_hierarchy = 'created_at'
+    autocomplete_fields = ['referrer', 'referred_user']
+    raw_id_fields = ['investment']
+
+
+@admin.register(ReferralAchievement)
+class ReferralAchievementAdmin(LargeTableAdmin):
+    list_display = ['user', 'pack', 'reward_amount', 'achieved_at']
+    list_filter = ['pack']
+    list_select_related = ['user', 'pack']
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
 
 
 @admin.register(KYCVerification)
 class KYCVerificationAdmin(admin.ModelAdmin):
     list_display = ['user', 'full_name', 'country', 'status', 'submitted_at', 'reviewed_at']
     list_filter = ['status', 'country', 'submitted_at']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email', 'full_name', 'id_number']
+    autocomplete_fields = ['user']
     date_hierarchy = 'submitted_at'
     
     fieldsets = (
@@ -84,11 +141,14 @@ class KYCVerificationAdmin(admin.ModelAdmin):
 
 
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
+class MessageAdmin(IndexedSearchMixin, LargeTableAdmin):
+    search_kind = 'message'
+    search_user_fields = ['sender', 'recipient']
     list_display = ['sender', 'recipient', 'subject', 'is_read', 'created_at']
     list_filter = ['is_read', 'offer_platform', 'link_status', 'created_at']
+    list_select_related = ['sender', 'recipient']
     search_fields = ['sender__username', 'recipient__username', 'subject', 'message']
-    date_hierarchy = 'created_at'
+    autocomplete_fields = ['sender', 'recipient']
     
     fieldsets = (
         ('Message Details', {
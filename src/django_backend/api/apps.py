@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+    
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from investment_backend.database import configure_sqlite_connection
+        
+        connection_created.connect(configure_sqlite_connection)
+        
+        from django.db.models.signals import post_delete
+        from .models import InboxCounter, Message
+        
+        post_delete.connect(InboxCounter.message_deleted, sender=Message, dispatch_uid='inbox-message-delete')
+        
+        from . import tasks  # noqa: F401  Registers job handlers
+        from . import search, versioning
+        
+        search.connect_signals()
+        versioning.connect_signals()
@@ -0,0 +1,81 @@
+"""
+Read-replica routing.
+
+Views decorated with read_from_replica run their queries against the
+'replica' database alias when one is configured (DATABASE_REPLICA_URL).
+All writes go to 'default'. After a user's own successful write the user is
+pinned to the primary for REPLICA_STICKY_SECONDS, so replication lag never
+hides a deposit or withdrawal they have just made.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_ALIAS = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Route reads inside the block to the replica"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send this user's reads to the primary for the stickiness window"""
+    if replica_configured():
+        cache.set(_pin_key(user_id), 1, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+def read_from_replica(view):
+    """Serve a read-only view from the replica unless the user wrote recently"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            or not replica_configured()
+            or (request.user.is_authenticated and is_pinned(request.user.id))
+        ):
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+    
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data set
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
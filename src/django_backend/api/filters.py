@@ -0,0 +1,229 @@
+"""
+Whitelisted filtering, sorting and prefix search for the admin list endpoints.
+
+Each endpoint declares a ListQuery: the query parameters it accepts, the
+column each one maps to, the sort keys and the prefix-searchable columns.
+Anything not declared is rejected, so every query the endpoints can build is
+one of a known, finite set of shapes, and check_admin_query_plans verifies
+that each of those shapes is answered from an index.
+
+Prefix search is written as a range (col >= 'abc' AND col < 'abd') rather
+than LIKE/istartswith, which btree indexes serve on both SQLite and Postgres
+regardless of collation settings. It is therefore case-sensitive.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import KYCVerification, Transaction, User, UserInvestment
+
+
+class InvalidQuery(ValueError):
+    """Raised for unknown or malformed list query parameters"""
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidQuery(f'Invalid date: {value}')
+
+
+def _parse_day_start(value):
+    """Midnight at the start of a day in the active timezone, for datetime columns"""
+    return timezone.make_aware(datetime.combine(_parse_date(value), time.min))
+
+
+def _parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise InvalidQuery(f'Invalid amount: {value}')
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidQuery(f'Invalid number: {value}')
+
+
+def _parse_bool(value):
+    if value not in ('true', 'false'):
+        raise InvalidQuery(f'Invalid boolean: {value}')
+    return value == 'true'
+
+
+# A valid raw value per parser, used by check_admin_query_plans
+EXAMPLE_VALUES = {
+    str: 'abc',
+    _parse_bool: 'true',
+    _parse_date: '2024-01-01',
+    _parse_day_start: '2024-01-01',
+    _parse_decimal: '100',
+    _parse_int: '1',
+}
+
+
+def prefix_range(prefix):
+    """(lower, upper) bounds matching every string that starts with prefix"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class Filter:
+    """One query parameter mapped onto a column lookup"""
+    
+    def __init__(self, field, lookup='exact', parse=str, choices=None):
+        self.field = field
+        self.lookup = lookup
+        self.parse = parse
+        self.choices = choices
+    
+    @property
+    def example(self):
+        """A value this filter accepts"""
+        return self.choices[0] if self.choices else EXAMPLE_VALUES[self.parse]
+    
+    def apply(self, queryset, raw):
+        value = self.parse(raw)
+        if self.choices is not None and value not in self.choices:
+            raise InvalidQuery(f'Invalid value: {raw}')
+        if self.lookup == 'date_lt':
+            # Inclusive end date: everything before the following midnight
+            return queryset.filter(**{f'{self.field}__lt': value + timedelta(days=1)})
+        return queryset.filter(**{f'{self.field}__{self.lookup}': value})
+
+
+def exact(field, **kwargs):
+    return Filter(field, 'exact', **kwargs)
+
+
+def date_from(field, timestamp=False):
+    return Filter(field, 'gte', _parse_day_start if timestamp else _parse_date)
+
+
+def date_to(field, timestamp=False):
+    return Filter(field, 'date_lt', _parse_day_start if timestamp else _parse_date)
+
+
+def amount_min(field):
+    return Filter(field, 'gte', _parse_decimal)
+
+
+def amount_max(field):
+    return Filter(field, 'lte', _parse_decimal)
+
+
+class ListQuery:
+    """Declared filters, sort keys and search columns for one list endpoint"""
+    
+    def __init__(self, filters, orderings, search_fields, default_ordering):
+        self.filters = filters
+        self.orderings = orderings
+        self.search_fields = search_fields
+        self.default_ordering = default_ordering
+    
+    def search(self, queryset, text):
+        lower, upper = prefix_range(text)
+        condition = Q()
+        for field in self.search_fields:
+            condition |= Q(**{f'{field}__gte': lower, f'{field}__lt': upper})
+        return queryset.filter(condition)
+    
+    def order(self, queryset, key):
+        descending = key.startswith('-')
+        field = self.orderings.get(key.lstrip('-'))
+        if field is None:
+            raise InvalidQuery(f'Invalid ordering: {key}')
+        prefix = '-' if descending else ''
+        return queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+    
+    def apply(self, queryset, params):
+        """Filter, search and sort a queryset from request query parameters"""
+        for name, spec in self.filters.items():
+            raw = params.get(name)
+            if raw not in (None, ''):
+                queryset = spec.apply(queryset, raw)
+        text = params.get('q')
+        if text and self.search_fields:
+            queryset = self.search(queryset, text)
+        return self.order(queryset, params.get('ordering') or self.default_ordering)
+
+
+def _choices(field_choices):
+    return [value for value, _ in field_choices]
+
+
+ADMIN_USERS = ListQuery(
+    filters={
+        'is_verified': exact('is_verified', parse=_parse_bool),
+        'is_kyc_verified': exact('is_kyc_verified', parse=_parse_bool),
+        'joined_from': date_from('created_at', timestamp=True),
+        'joined_to': date_to('created_at', timestamp=True),
+        'min_balance': amount_min('balance'),
+        'max_balance': amount_max('balance'),
+    },
+    orderings={'created_at': 'created_at', 'balance': 'balance', 'username': 'username'},
+    search_fields=['username', 'email', 'referral_code'],
+    default_ordering='-created_at',
+)
+
+ADMIN_TRANSACTIONS = ListQuery(
+    filters={
+        'status': exact('status', choices=_choices(Transaction.STATUS_CHOICES)),
+        'date_from': date_from('created_at', timestamp=True),
+        'date_to': date_to('created_at', timestamp=True),
+        'min_amount': amount_min('amount'),
+        'max_amount': amount_max('amount'),
+    },
+    orderings={'created_at': 'created_at', 'amount': 'amount'},
+    search_fields=['wallet_address', 'transaction_hash'],
+    default_ordering='-created_at',
+)
+
+ADMIN_KYC = ListQuery(
+    filters={
+        'status': exact('status', choices=_choices(KYCVerification.STATUS_CHOICES)),
+        'image_status': exact('image_status', choices=_choices(KYCVerification.IMAGE_STATUS_CHOICES)),
+        'date_from': date_from('submitted_at', timestamp=True),
+        'date_to': date_to('submitted_at', timestamp=True),
+    },
+    orderings={'submitted_at': 'submitted_at'},
+    search_fields=[],
+    default_ordering='-submitted_at',
+)
+
+ADMIN_INVESTMENTS = ListQuery(
+    filters={
+        'status': exact('status', choices=_choices(UserInvestment.STATUS_CHOICES)),
+        'pack': exact('pack_id', parse=_parse_int),
+        'date_from': date_from('start_date'),
+        'date_to': date_to('start_date'),
+        'min_amount': amount_min('amount'),
+        'max_amount': amount_max('amount'),
+    },
+    orderings={'start_date': 'start_date', 'amount': 'amount'},
+    search_fields=[],
+    default_ordering='-start_date',
+)
+
+# Endpoint name -> (base queryset, declared query); shared by the views and
+# the check_admin_query_plans command so both build exactly the same SQL
+ADMIN_LISTS = {
+    'users': (lambda: User.objects.filter(role='customer'), ADMIN_USERS),
+    'deposits': (lambda: Transaction.objects.filter(type='deposit'), ADMIN_TRANSACTIONS),
+    'withdrawals': (lambda: Transaction.objects.filter(type='withdrawal'), ADMIN_TRANSACTIONS),
+    'kyc': (lambda: KYCVerification.objects.all(), ADMIN_KYC),
+    'investments': (
+        lambda: UserInvestment.objects.select_related('pack'),
+        ADMIN_INVESTMENTS
+    ),
+}
+
+
+def admin_list_queryset(name, params):
+    """Base queryset for an admin list endpoint with request filters applied"""
+    base, query = ADMIN_LISTS[name]
+    return query.apply(base(), params)
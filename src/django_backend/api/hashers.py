@@ -0,0 +1,69 @@
+"""
+Password hashers with per-deployment costs.
+
+PASSWORD_HASHER_PROFILE picks the hasher that hashes new passwords (see
+PASSWORD_HASHER_PROFILES in settings). The other hashers stay in
+PASSWORD_HASHERS to verify existing hashes, so switching profile or
+changing a cost never locks anyone out. On a user's next successful login
+Django re-hashes their password with the current profile and cost
+(User.check_password -> must_update), so the whole user base migrates as
+people log in.
+
+    pbkdf2  PBKDF2-SHA256, CPU-bound, PASSWORD_PBKDF2_ITERATIONS rounds
+    scrypt  memory-hard via stdlib hashlib.scrypt, 128 * N * r bytes per hash
+    argon2  memory-hard Argon2id, requires the argon2-cffi package
+
+Measure each profile on the production hardware with
+bench_password_hashers before changing costs.
+"""
+import base64
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = settings.PASSWORD_SCRYPT_WORK_FACTOR
+    block_size = settings.PASSWORD_SCRYPT_BLOCK_SIZE
+    parallelism = 1
+    
+    def encode(self, password, salt, n=None, r=None, p=None):
+        # Same as Django's, except that hashlib's memory limit (32 MiB unless
+        # raised) is sized from the parameters being hashed with: verify
+        # passes those of the stored hash, which may cost more than the
+        # current settings
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=2 * 128 * n * r * p,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST  # KiB
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+def memory_per_hash(hasher):
+    """Bytes of memory one hash needs, for sizing workers"""
+    if isinstance(hasher, hashers.ScryptPasswordHasher):
+        return 128 * hasher.work_factor * hasher.block_size * hasher.parallelism
+    if isinstance(hasher, hashers.Argon2PasswordHasher):
+        return hasher.memory_cost * 1024
+    return 0
@@ -0,0 +1,109 @@
+"""
+Idempotency-Key support for money-moving POST endpoints.
+
+A client that retries a request after a timeout sends the same
+Idempotency-Key header. The first request claims the key by inserting an
+IdempotencyRecord in the same database transaction as the view's own writes,
+and the response is stored on that row before commit. A retry finds the row
+and gets the stored response back without the view running again.
+
+Concurrent duplicates are settled by the (user, key) unique constraint: the
+second insert waits for the first transaction and then fails, and the
+duplicate replays the committed response. If the first request fails with a
+server error its transaction rolls back, releasing the key for a retry.
+Reusing a key with a different body is rejected with 422. Expired records
+are removed by the purge_idempotency_keys command.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """Hash the parts of a request that must match for a replay"""
+    data = request.data
+    if isinstance(data, QueryDict):
+        data = {key: data.getlist(key) for key in sorted(data)}
+    body = json.dumps(data, sort_keys=True, default=str)
+    payload = f'{request.method}\n{request.path}\n{body}'
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _should_store(response):
+    # Server errors roll back so the key can be retried. 409/429 describe a
+    # transient state, not the outcome of the request, so they are not kept.
+    return response.status_code < 500 and response.status_code not in (409, 429)
+
+
+def idempotent(view):
+    """Replay the stored response when a request repeats its Idempotency-Key"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fingerprint = request_fingerprint(request)
+        for _ in range(2):
+            now = timezone.now()
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        record = IdempotencyRecord.objects.create(
+                            user=request.user,
+                            key=key,
+                            fingerprint=fingerprint,
+                            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                        )
+                except IntegrityError:
+                    record = None
+                
+                if record is not None:
+                    response = view(request, *args, **kwargs)
+                    if _should_store(response):
+                        record.status_code = response.status_code
+                        record.response_body = response.data
+                        record.save(update_fields=['status_code', 'response_body'])
+                    else:
+                        transaction.set_rollback(True)
+                    return response
+            
+            existing = IdempotencyRecord.objects.filter(user=request.user, key=key).first()
+            if existing is not None and existing.expires_at > now:
+                if existing.fingerprint != fingerprint:
+                    return Response(
+                        {'detail': f'{HEADER} was already used for a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                return _replay(existing)
+            # Expired: drop the old record and claim the key again
+            IdempotencyRecord.objects.filter(user=request.user, key=key, expires_at__lte=now).delete()
+        return Response(
+            {'detail': f'{HEADER} is being processed, retry shortly'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return wrapped
@@ -0,0 +1,135 @@
+"""
+Database-backed job queue for deferred side effects.
+
+Views call enqueue() inside their own transaction, so a job row exists if and
+only if the core write committed. Jobs are claimed by a conditional UPDATE
+that moves run_at forward by JOB_VISIBILITY_TIMEOUT: if a worker dies
+mid-job the lease expires and another worker picks the job up again. A
+failing job is retried with exponential backoff until max_attempts, then
+left as 'failed' for inspection. Delivery is at least once, so every handler
+must be safe to run twice.
+
+JOBS_MODE decides who runs jobs after commit:
+  'worker' - only `python manage.py run_jobs` processes
+  'thread' - an in-process thread pool starts them immediately; the row stays
+             durable, so a worker still recovers anything a crash interrupted
+  'eager'  - run synchronously when the transaction commits (tests, scripts)
+"""
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_executor = None
+
+
+def job(name, max_attempts=5):
+    """Register a function as the handler for jobs called `name`"""
+    def register(func):
+        _handlers[name] = (func, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, delay=0, **payload):
+    """Store a job in the current transaction and start it after commit"""
+    if name not in _handlers:
+        raise KeyError(f'Unknown job: {name}')
+    record = Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=_handlers[name][1],
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    mode = settings.JOBS_MODE
+    if mode != 'worker' and not delay:
+        if mode == 'eager':
+            transaction.on_commit(lambda: run_job(record.id))
+        else:
+            transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, record.id))
+    return record
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.JOB_THREADS, thread_name_prefix='jobs')
+    return _executor
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception('Job %s crashed', job_id)
+    finally:
+        close_old_connections()
+
+
+def _due(now):
+    # Queued jobs whose time has come, and running jobs whose lease expired
+    return Job.objects.filter(status__in=['queued', 'running'], run_at__lte=now)
+
+
+def claim(job_id):
+    """Take the lease on one due job; returns the job or None if someone else has it"""
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT)
+    claimed = _due(now).filter(id=job_id).update(
+        status='running', run_at=lease, attempts=F('attempts') + 1, updated_at=now
+    )
+    if not claimed:
+        return None
+    return Job.objects.get(id=job_id)
+
+
+def claim_batch(limit):
+    """Claim up to `limit` due jobs, oldest first"""
+    ids = list(_due(timezone.now()).order_by('run_at').values_list('id', flat=True)[:limit])
+    return [record for record in map(claim, ids) if record is not None]
+
+
+def run_job(job_id):
+    """Claim and execute one job; returns True if it ran successfully"""
+    record = claim(job_id)
+    if record is None:
+        return False
+    return execute(record)
+
+
+def execute(record):
+    """Run a claimed job and record the outcome"""
+    claimed = Job.objects.filter(id=record.id, attempts=record.attempts)
+    handler = _handlers.get(record.name)
+    try:
+        if handler is None:
+            raise KeyError(f'No handler registered for job {record.name!r}')
+        handler[0](**record.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if record.attempts >= record.max_attempts:
+            logger.error('Job %s (%s) failed permanently', record.id, record.name)
+            claimed.update(status='failed', last_error=error, updated_at=timezone.now())
+        else:
+            backoff = settings.JOB_RETRY_BACKOFF * 2 ** (record.attempts - 1)
+            logger.warning('Job %s (%s) failed, retrying in %ss', record.id, record.name, backoff)
+            claimed.update(
+                status='queued',
+                run_at=timezone.now() + timedelta(seconds=backoff),
+                last_error=error,
+                updated_at=timezone.now(),
+            )
+        return False
+    claimed.delete()
+    return True
@@ -0,0 +1,144 @@
+"""
+Background processing for KYC document images.
+
+Uploads are stored as received and a process_kyc_images job is queued in
+the submitting transaction (see api/jobs.py). Each image is validated, re-encoded as a
+metadata-free JPEG capped at KYC_IMAGE_MAX_DIMENSION and given a thumbnail
+that the admin review list serves instead of the full-size file. The
+originals, which still carry their metadata, are deleted afterwards;
+content-addressed ones once no other submission references them.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .jobs import enqueue
+from .uploads import CAS_DIRECTORY, store_content_addressed
+
+logger = logging.getLogger(__name__)
+
+# (source field, thumbnail field)
+IMAGE_FIELDS = [
+    ('id_front_image', 'id_front_thumbnail'),
+    ('id_back_image', 'id_back_thumbnail'),
+    ('selfie_image', 'selfie_thumbnail'),
+]
+
+
+class InvalidImage(Exception):
+    """Raised when an upload cannot be decoded as a safe image"""
+
+
+def schedule_processing(kyc_id):
+    """Queue processing of a submission's images with the current transaction"""
+    enqueue('process_kyc_images', kyc_id=kyc_id)
+
+
+def _encode_jpeg(img):
+    out = io.BytesIO()
+    # No exif/icc arguments: the re-encoded file carries no metadata
+    img.save(out, format='JPEG', quality=settings.KYC_IMAGE_QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def normalize_image(data):
+    """Return (normalized JPEG bytes, thumbnail JPEG bytes) for raw upload bytes"""
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            width, height = probe.size
+            if width * height > settings.KYC_MAX_IMAGE_PIXELS:
+                raise InvalidImage(f'Image too large: {width}x{height}')
+            probe.verify()
+        
+        with Image.open(io.BytesIO(data)) as img:
+            # Apply the EXIF orientation before the metadata is dropped
+            img = ImageOps.exif_transpose(img).convert('RGB')
+            max_dim = settings.KYC_IMAGE_MAX_DIMENSION
+            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+            full = _encode_jpeg(img)
+            
+            thumb_dim = settings.KYC_THUMBNAIL_SIZE
+            img.thumbnail((thumb_dim, thumb_dim), Image.LANCZOS)
+            thumbnail = _encode_jpeg(img)
+    except InvalidImage:
+        raise
+    except Exception as exc:
+        raise InvalidImage(str(exc)) from exc
+    
+    return full, thumbnail
+
+
+def _referenced(name):
+    from .models import KYCVerification
+    
+    return KYCVerification.objects.filter(
+        Q(id_front_image=name) | Q(id_back_image=name) | Q(selfie_image=name)
+    ).exists()
+
+
+def _delete_original(storage, name, data):
+    """Delete a processed original, unless it is a shared copy still in use"""
+    if not name.startswith(CAS_DIRECTORY + '/'):
+        storage.delete(name)
+        return
+    if _referenced(name):
+        return
+    storage.delete(name)
+    # A submission of the same file committed since the check would find its
+    # copy gone; it stores it again after committing, and so does this
+    if _referenced(name):
+        store_content_addressed(storage, name, ContentFile(data))
+
+
+def process_kyc_images(kyc_id):
+    """Normalize every image on a KYC submission and attach thumbnails"""
+    from .models import KYCVerification
+    
+    close_old_connections()
+    try:
+        stale_files = []
+        with transaction.atomic():
+            # A repeated delivery waits for the first run and then finds the
+            # submission no longer pending, instead of re-encoding its output
+            kyc = KYCVerification.objects.select_for_update().filter(id=kyc_id).first()
+            if kyc is None or kyc.image_status != 'pending':
+                return
+            
+            update_fields = ['image_status']
+            try:
+                for source_field, thumbnail_field in IMAGE_FIELDS:
+                    source = getattr(kyc, source_field)
+                    if not source:
+                        continue
+                    
+                    with source.open('rb') as fh:
+                        data = fh.read()
+                    full, thumbnail = normalize_image(data)
+                    
+                    base = os.path.splitext(os.path.basename(source.name))[0]
+                    stale_files.append((source.storage, source.name, data))
+                    source.save(f'{base}.jpg', ContentFile(full), save=False)
+                    getattr(kyc, thumbnail_field).save(f'{base}_thumb.jpg', ContentFile(thumbnail), save=False)
+                    update_fields += [source_field, thumbnail_field]
+                
+                kyc.image_status = 'ready'
+            except InvalidImage:
+                logger.warning('KYC %s has an invalid image', kyc_id, exc_info=True)
+                kyc.image_status = 'failed'
+            
+            kyc.save(update_fields=update_fields)
+        
+        # Originals are removed only once the normalized copies are committed
+        for storage, name, data in stale_files:
+            _delete_original(storage, name, data)
+    except Exception:
+        logger.exception('Processing images for KYC %s failed', kyc_id)
+        raise  # Let the job be retried
+    finally:
+        close_old_connections()
@@ -0,0 +1,61 @@
+"""
+Move settled Transaction and Message rows older than ARCHIVE_AFTER_DAYS into
+the archive tables, one short transaction per batch so writers on the hot
+tables are never blocked for long.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import ArchivedMessage, ArchivedTransaction, Message, Transaction
+
+TRANSACTION_FIELDS = [
+    'id', 'user_id', 'type', 'amount', 'status', 'wallet_address',
+    'transaction_hash', 'admin_note', 'created_at', 'updated_at',
+]
+MESSAGE_FIELDS = [
+    'id', 'sender_id', 'recipient_id', 'subject', 'message', 'offer_platform',
+    'submitted_link', 'link_status', 'is_read', 'created_at',
+]
+
+
+class Command(BaseCommand):
+    help = 'Archive settled transactions and read messages'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        
+        settled_transactions = Transaction.objects.filter(created_at__lt=cutoff).exclude(status='pending')
+        settled_messages = Message.objects.filter(created_at__lt=cutoff, is_read=True).exclude(link_status='pending')
+        
+        if options['dry_run']:
+            self.stdout.write(f'Would archive {settled_transactions.count()} transactions')
+            self.stdout.write(f'Would archive {settled_messages.count()} messages')
+            return
+        
+        moved = self._archive(settled_transactions, ArchivedTransaction, TRANSACTION_FIELDS, options['batch_size'])
+        self.stdout.write(f'Archived {moved} transactions')
+        moved = self._archive(settled_messages, ArchivedMessage, MESSAGE_FIELDS, options['batch_size'])
+        self.stdout.write(f'Archived {moved} messages')
+    
+    def _archive(self, queryset, archive_model, fields, batch_size):
+        moved = 0
+        while True:
+            with transaction.atomic():
+                rows = list(queryset.order_by('id').values(*fields)[:batch_size])
+                if not rows:
+                    return moved
+                archive_model.objects.bulk_create(
+                    [archive_model(**row) for row in rows],
+                    ignore_conflicts=True
+                )
+                queryset.model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            moved += len(rows)
@@ -0,0 +1,56 @@
+"""
+Credit the referral milestone rewards users reached before rewards were
+paid, or reached for packs added since. Users are read from AffiliateStats
+in batches along its primary key, with one achievements query per batch;
+rewards already credited are skipped, so the command is safe to re-run and
+to run next to live commissions. If the stored totals may be off, run
+rebuild_affiliate_stats first.
+
+    python manage.py backfill_referral_rewards --dry-run
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from api import milestones
+from api.models import AffiliateStats, ReferralAchievement
+
+
+class Command(BaseCommand):
+    help = 'Credit referral milestone rewards for existing referral counts'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report the rewards without crediting them')
+    
+    def handle(self, *args, **options):
+        _, thresholds = milestones.milestones()
+        if not thresholds:
+            self.stdout.write('No referral packs')
+            return
+        
+        stats = (
+            AffiliateStats.objects.filter(referral_count__gte=max(thresholds[0], 1))
+            .order_by('user_id')
+            .values_list('user_id', 'referral_count')
+        )
+        credited, total, last_id = 0, Decimal('0'), 0
+        while True:
+            rows = list(stats.filter(user_id__gt=last_id)[:options['batch_size']])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            existing = set(
+                ReferralAchievement.objects.filter(user_id__in=[user_id for user_id, _ in rows])
+                .values_list('user_id', 'pack_id')
+            )
+            for user_id, referral_count in rows:
+                for milestone in milestones.crossed(0, referral_count):
+                    if (user_id, milestone.pack_id) in existing:
+                        continue
+                    if options['dry_run'] or milestones.award(user_id, milestone):
+                        credited += 1
+                        total += milestone.reward_amount
+        
+        verb = 'Would credit' if options['dry_run'] else 'Credited'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {credited} referral rewards totalling {total}'))
@@ -0,0 +1,77 @@
+"""
+Rebuild ReportRollup from the raw Transaction (including ArchivedTransaction)
+and UserInvestment tables. The write paths keep the rollups current afterwards; run this once after
+upgrading or to repair them.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from api.models import ArchivedTransaction, ReportRollup, Transaction, UserInvestment
+
+TRUNCATIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+class Command(BaseCommand):
+    help = 'Recompute reporting rollups from transactions and investments'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        rows = []
+        for period, trunc in TRUNCATIONS.items():
+            # Archived rows share buckets with hot ones, so sum both per key
+            totals = {}
+            for model in (Transaction, ArchivedTransaction):
+                transactions = (
+                    model.objects.annotate(bucket=trunc('created_at'))
+                    .values('bucket', 'type', 'status')
+                    .annotate(count=Count('id'), amount=Sum('amount'))
+                    .order_by()
+                )
+                for row in transactions.iterator():
+                    key = (_as_date(row['bucket']), row['type'], row['status'])
+                    count, amount = totals.get(key, (0, 0))
+                    totals[key] = (count + row['count'], amount + (row['amount'] or 0))
+            for (bucket, kind, status), (count, amount) in totals.items():
+                rows.append(ReportRollup(
+                    period=period,
+                    bucket=bucket,
+                    kind=kind,
+                    status=status,
+                    count=count,
+                    amount=amount,
+                ))
+            
+            investments = (
+                UserInvestment.objects.annotate(bucket=trunc('start_date'))
+                .values('bucket', 'pack_id', 'status')
+                .annotate(count=Count('id'), amount=Sum('amount'))
+                .order_by()
+            )
+            for row in investments.iterator():
+                rows.append(ReportRollup(
+                    period=period,
+                    bucket=_as_date(row['bucket']),
+                    kind='investment',
+                    status=row['status'],
+                    pack_key=row['pack_id'],
+                    count=row['count'],
+                    amount=row['amount'] or 0,
+                ))
+        
+        with transaction.atomic():
+            ReportRollup.objects.all().delete()
+            ReportRollup.objects.bulk_create(rows, batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(rows)} rollup rows'))
+
+
+def _as_date(value):
+    return value.date() if hasattr(value, 'date') else value
@@ -0,0 +1,154 @@
+"""
+Time Django admin Transaction changelist loads on a large seeded table.
+
+Seeds --rows Transaction rows with a single INSERT ... SELECT per chunk
+(SQLite or Postgres), analyzes the table, then renders the changelist for a
+few typical URLs. With --compare the same URLs are also rendered through the
+previous admin configuration (exact COUNT(*)s, date_hierarchy, per-row user
+queries, icontains search) for reference. The seeded rows and bench users
+are deleted afterwards.
+
+It writes to the default database, so it refuses to run unless that
+database's name marks it as a scratch copy (contains "scratch", "bench" or
+"test") or --yes is passed:
+
+    DATABASE_URL=sqlite:///bench.sqlite3 python manage.py bench_admin_changelist --rows 10000000 --compare
+"""
+import statistics
+import time
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Transaction
+
+User = get_user_model()
+
+SCRATCH_MARKERS = ('scratch', 'bench', 'test')
+MIN_ROWS = 50 * 100  # 'page 50' below at 100 rows per page
+
+URLS = [
+    ('first page', {}),
+    ('status filter', {'status__exact': 'pending'}),
+    ('type + status', {'type__exact': 'deposit', 'status__exact': 'pending'}),
+    ('page 50', {'p': '50'}),
+    ('search', {'q': 'HASH-123456'}),
+]
+
+SQLITE_SEED = """
+    INSERT INTO api_transaction
+        (user_id, type, amount, status, wallet_address, transaction_hash, admin_note, created_at, updated_at)
+    WITH RECURSIVE seq(n) AS (SELECT %s UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+    SELECT %s,
+           CASE n %% 4 WHEN 0 THEN 'deposit' WHEN 1 THEN 'withdrawal' WHEN 2 THEN 'earning'
+                ELSE 'referral_commission' END,
+           n %% 5000,
+           CASE n %% 3 WHEN 0 THEN 'pending' WHEN 1 THEN 'approved' ELSE 'completed' END,
+           'WALLET-' || n, 'HASH-' || n, '',
+           datetime('now', '-' || (n %% 730) || ' days'), datetime('now')
+    FROM seq
+"""
+
+POSTGRES_SEED = """
+    INSERT INTO api_transaction
+        (user_id, type, amount, status, wallet_address, transaction_hash, admin_note, created_at, updated_at)
+    SELECT %s,
+           (ARRAY['deposit', 'withdrawal', 'earning', 'referral_commission'])[n %% 4 + 1],
+           n %% 5000,
+           (ARRAY['pending', 'approved', 'completed'])[n %% 3 + 1],
+           'WALLET-' || n, 'HASH-' || n, '',
+           now() - (n %% 730) * interval '1 day', now()
+    FROM generate_series(%s, %s) AS n
+"""
+
+
+class LegacyTransactionAdmin(admin.ModelAdmin):
+    """TransactionAdmin as configured before the changelist tuning"""
+    list_display = ['user', 'type', 'amount', 'status', 'created_at']
+    list_filter = ['type', 'status', 'created_at']
+    search_fields = ['user__username', 'user__email', 'transaction_hash', 'wallet_address']
+    date_hierarchy = 'created_at'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the Transaction admin changelist on a large table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, required=True, help='Transaction rows to seed')
+        parser.add_argument('--chunk', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--compare', action='store_true', help='Also time the previous admin setup')
+        parser.add_argument('--yes', action='store_true', help='Seed even if the database is not a scratch copy')
+    
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError('Seeding supports SQLite and Postgres only')
+        if options['rows'] < MIN_ROWS:
+            raise CommandError(f'--rows must be at least {MIN_ROWS} for the page 50 URL')
+        name = str(connection.settings_dict['NAME'])
+        if not options['yes'] and not any(marker in name.lower() for marker in SCRATCH_MARKERS):
+            raise CommandError(
+                f'Refusing to seed {options["rows"]} rows into {name}; '
+                'use a scratch database or pass --yes'
+            )
+        
+        user, _ = User.objects.get_or_create(
+            username='bench-changelist', defaults={'email': 'bench-changelist@example.com'}
+        )
+        superuser, _ = User.objects.get_or_create(
+            username='bench-admin',
+            defaults={'email': 'bench-admin@example.com', 'is_staff': True, 'is_superuser': True},
+        )
+        try:
+            self.seed(user, options['rows'], options['chunk'])
+            self.bench(superuser, options)
+        finally:
+            self.stdout.write('Deleting seeded rows')
+            with connection.cursor() as cursor:
+                # Raw DELETE: the ORM would load every row to send delete signals
+                cursor.execute(f'DELETE FROM {Transaction._meta.db_table} WHERE user_id = %s', [user.id])
+            User.objects.filter(id__in=[user.id, superuser.id]).delete()
+    
+    def bench(self, superuser, options):
+        admins = [('tuned', admin.site._registry[Transaction])]
+        if options['compare']:
+            admins.append(('previous', LegacyTransactionAdmin(Transaction, admin.site)))
+        
+        factory = RequestFactory()
+        for label, params in URLS:
+            for name, model_admin in admins:
+                timings, queries = [], 0
+                for _ in range(options['repeat']):
+                    request = factory.get('/admin/api/transaction/', params)
+                    request.user = superuser
+                    request.session = {}
+                    request._messages = FallbackStorage(request)
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        model_admin.changelist_view(request).render()
+                        timings.append(time.perf_counter() - started)
+                    queries = len(captured)
+                self.stdout.write(
+                    f'{label:14} {name:9} median {statistics.median(timings) * 1000:9.1f} ms  '
+                    f'max {max(timings) * 1000:9.1f} ms  {queries:3} queries'
+                )
+    
+    def seed(self, user, rows, chunk):
+        start = 1
+        while start <= rows:
+            end = min(start + chunk - 1, rows)
+            with transaction.atomic(), connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute(SQLITE_SEED, [start, end, user.id])
+                else:
+                    cursor.execute(POSTGRES_SEED, [user.id, start, end])
+            self.stdout.write(f'Seeded rows {start}-{end}')
+            start = end + 1
+        
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
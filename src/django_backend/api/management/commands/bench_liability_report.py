@@ -0,0 +1,130 @@
+"""
+Time the admin liability report on a large seeded investment table.
+
+Seeds --investments UserInvestment rows with a single INSERT ... SELECT per
+chunk (SQLite or Postgres), analyzes the table, then computes the report
+with the cache bypassed. The seeded rows, the bench customer and its
+(inactive) pack are deleted afterwards.
+
+It writes to the default database, so it refuses to run unless that
+database's name marks it as a scratch copy (contains "scratch", "bench" or
+"test") or --yes is passed:
+
+    DATABASE_URL=sqlite:///bench.sqlite3 python manage.py bench_liability_report --investments 1000000 --days 365
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import InvestmentPack, UserInvestment
+from api.projections import liability_cache_key, liability_report
+
+User = get_user_model()
+
+SCRATCH_MARKERS = ('scratch', 'bench', 'test')
+
+SQLITE_SEED = """
+    INSERT INTO api_userinvestment
+        (user_id, pack_id, amount, start_date, end_date, daily_return, total_return, status, created_at)
+    WITH RECURSIVE seq(n) AS (SELECT %s UNION ALL SELECT n + 1 FROM seq WHERE n < %s)
+    SELECT %s, %s, 100 + n %% 9900,
+           date('now', '-' || (n %% 60) || ' days'),
+           date('now', '-' || (n %% 60) || ' days', '+' || (30 + n %% 3 * 30) || ' days'),
+           round((100 + n %% 9900) * 0.015, 2), 0,
+           CASE WHEN n %% 10 = 0 THEN 'completed' ELSE 'active' END,
+           datetime('now')
+    FROM seq
+"""
+
+POSTGRES_SEED = """
+    INSERT INTO api_userinvestment
+        (user_id, pack_id, amount, start_date, end_date, daily_return, total_return, status, created_at)
+    SELECT %s, %s, 100 + n %% 9900,
+           current_date - n %% 60,
+           current_date - n %% 60 + 30 + n %% 3 * 30,
+           round((100 + n %% 9900) * 0.015, 2), 0,
+           CASE WHEN n %% 10 = 0 THEN 'completed' ELSE 'active' END,
+           now()
+    FROM generate_series(%s, %s) AS n
+"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the admin liability report on a large investment table'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--investments', type=int, default=1_000_000)
+        parser.add_argument('--chunk', type=int, default=250_000)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--yes', action='store_true', help='Seed even if the database is not a scratch copy')
+    
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError('Seeding supports SQLite and Postgres only')
+        name = str(connection.settings_dict['NAME'])
+        if not options['yes'] and not any(marker in name.lower() for marker in SCRATCH_MARKERS):
+            raise CommandError(
+                f'Refusing to seed {options["investments"]} investments into {name}; '
+                'use a scratch database or pass --yes'
+            )
+        
+        user, _ = User.objects.get_or_create(
+            username='bench-liability', defaults={'email': 'bench-liability@example.com'}
+        )
+        # Inactive, so customers never see it in the pack list while the bench runs
+        pack = InvestmentPack.objects.create(
+            name='Bench Pack', min_amount=100, max_amount=10000, daily_return_rate=1.5,
+            duration_days=30, is_active=False
+        )
+        try:
+            self.seed(user, pack, options['investments'], options['chunk'])
+            self.bench(options)
+        finally:
+            self.stdout.write('Deleting seeded rows')
+            with connection.cursor() as cursor:
+                # Raw DELETE: the ORM would load every row to send delete signals
+                cursor.execute(f'DELETE FROM {UserInvestment._meta.db_table} WHERE pack_id = %s', [pack.id])
+            pack.delete()
+            user.delete()
+            cache.delete(liability_cache_key(options['days']))
+    
+    def bench(self, options):
+        timings, queries = [], 0
+        for _ in range(options['repeat']):
+            cache.delete(liability_cache_key(options['days']))
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                report = liability_report(options['days'])
+                timings.append(time.perf_counter() - started)
+            queries = len(captured)
+        
+        self.stdout.write(
+            f'liability report ({options["days"]} days): median {statistics.median(timings) * 1000:.1f} ms  '
+            f'max {max(timings) * 1000:.1f} ms  {queries} queries'
+        )
+        self.stdout.write(
+            f'remaining returns {report["remaining_returns"]:,.2f}  '
+            f'active principal {report["active_principal"]:,.2f}  '
+            f'total obligations {report["total_obligations"]:,.2f}'
+        )
+    
+    def seed(self, user, pack, rows, chunk):
+        start = 1
+        while start <= rows:
+            end = min(start + chunk - 1, rows)
+            with transaction.atomic(), connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute(SQLITE_SEED, [start, end, user.id, pack.id])
+                else:
+                    cursor.execute(POSTGRES_SEED, [user.id, pack.id, start, end])
+            self.stdout.write(f'Seeded investments {start}-{end}')
+            start = end + 1
+        
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
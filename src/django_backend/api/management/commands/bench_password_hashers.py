@@ -0,0 +1,89 @@
+"""
+Measure password hashing cost per hasher profile, for sizing workers.
+
+Each profile's hasher is run single-threaded for --seconds with the costs
+configured in settings, so the rate reported is hashes per second per core
+(a login verifies one hash, a signup or upgrade computes one). With
+--logins-per-second the report adds how many cores that login rate needs.
+Each profile is also checked against a change of cost: hashes made at
+double and at half the configured cost must still verify and be flagged
+for re-hashing, or the command fails:
+
+    python manage.py bench_password_hashers --logins-per-second 50
+"""
+import copy
+import math
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from api.hashers import memory_per_hash
+
+PASSWORD = 'Bench-password-1'
+
+# Hasher attributes holding a cost, per profile
+COST_ATTRIBUTES = ['iterations', 'work_factor', 'time_cost', 'memory_cost']
+
+
+class Command(BaseCommand):
+    help = 'Report hashes/second per core for each password hasher profile'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=sorted(settings.PASSWORD_HASHER_PROFILES), action='append')
+        parser.add_argument('--seconds', type=float, default=3.0, help='Time spent on each profile')
+        parser.add_argument('--logins-per-second', type=float, help='Target login rate to size cores for')
+    
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        self.stdout.write(f'{cores} cores; active profile: {settings.PASSWORD_HASHER_PROFILE}')
+        for name in options['profile'] or settings.PASSWORD_HASHER_PROFILES:
+            hasher = import_string(settings.PASSWORD_HASHER_PROFILES[name])()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as exc:
+                # Optional library (argon2-cffi) missing
+                self.stdout.write(self.style.WARNING(f'{name:7} unavailable: {exc}'))
+                continue
+            
+            rate = self.rate(lambda: hasher.verify(PASSWORD, encoded), options['seconds'])
+            params = ', '.join(
+                f'{key} {value}' for key, value in hasher.safe_summary(encoded).items()
+                if key not in ('algorithm', 'salt', 'hash')
+            )
+            line = (
+                f'{name:7} {rate:8.1f} hashes/s/core  {1000 / rate:8.1f} ms/hash  '
+                f'{memory_per_hash(hasher) / 2 ** 20:6.1f} MiB/hash  ~{rate * cores:8.1f}/s on all cores  ({params})'
+            )
+            if options['logins_per_second']:
+                line += f'  cores for {options["logins_per_second"]:g} logins/s: '
+                line += str(math.ceil(options['logins_per_second'] / rate))
+            self.stdout.write(line)
+            self.check_cost_change(name, hasher)
+    
+    def check_cost_change(self, name, hasher):
+        """Hashes made before a cost change must still log their users in, and get upgraded"""
+        for factor in (2, 0.5):
+            previous = copy.copy(hasher)
+            for attribute in COST_ATTRIBUTES:
+                if hasattr(previous, attribute):
+                    setattr(previous, attribute, max(1, int(getattr(previous, attribute) * factor)))
+            encoded = previous.encode(PASSWORD, previous.salt())
+            try:
+                verified = hasher.verify(PASSWORD, encoded)
+            except ValueError as exc:
+                raise CommandError(f'{name}: a hash made at {factor:g}x the cost fails to verify: {exc}')
+            if not verified or not hasher.must_update(encoded):
+                raise CommandError(f'{name}: a hash made at {factor:g}x the cost is not verified and upgraded')
+        self.stdout.write(f'{name:7} hashes made at 2x and 0.5x the cost verify and are upgraded')
+    
+    def rate(self, operation, seconds):
+        operation()  # Warm up
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            operation()
+            count += 1
+        return count / (time.perf_counter() - started)
@@ -0,0 +1,100 @@
+"""
+Burst load test for the signup path.
+
+Concurrent client threads push --signups registrations through
+SignupSerializer, the same validation, hashing and insert the signup
+endpoint runs, with the endpoint's throttle left out. Half of the signups
+use a referral code. The report shows signups per second and latency
+percentiles. With --compare the burst runs again with passwords hashed on
+the request threads (PASSWORD_HASH_WORKERS=0) for reference. The users
+created are deleted afterwards.
+
+    python manage.py loadtest_signup --signups 500 --concurrency 32 --compare
+"""
+import statistics
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from api.serializers import SignupSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure signups per second under a burst of concurrent registrations'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--signups', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--compare', action='store_true', help='Also run with inline password hashing')
+    
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        referrer = User.objects.create_user(f'lt-{run}-referrer', f'lt-{run}-referrer@example.com')
+        try:
+            modes = [('pool', {})]
+            if options['compare']:
+                modes.append(('inline', {'PASSWORD_HASH_WORKERS': 0}))
+            for name, overrides in modes:
+                with override_settings(**overrides):
+                    self.burst(f'lt-{run}-{name}', referrer.referral_code, options['signups'], options['concurrency'])
+        finally:
+            User.objects.filter(username__startswith=f'lt-{run}-').delete()
+    
+    def burst(self, prefix, referral_code, signups, concurrency):
+        # Warm the pool (and connection) so worker start-up is not measured
+        self.signup(f'{prefix}-warmup', referral_code)
+        numbers = iter(range(signups))
+        lock = threading.Lock()
+        latencies, failures = [], []
+        
+        def client():
+            samples = []
+            while True:
+                with lock:
+                    i = next(numbers, None)
+                if i is None:
+                    break
+                started = time.perf_counter()
+                try:
+                    self.signup(f'{prefix}-{i}', referral_code if i % 2 else '')
+                except Exception as exc:
+                    failures.append(exc)
+                samples.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                latencies.extend(samples)
+        
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        if failures:
+            raise CommandError(f'{len(failures)} signups failed, first: {failures[0]!r}')
+        latencies.sort()
+        self.stdout.write(
+            f'{prefix.rsplit("-", 1)[-1]:6} {signups} signups in {elapsed:6.2f}s  '
+            f'{signups / elapsed:7.1f}/s  p50 {statistics.median(latencies) * 1000:7.1f} ms  '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f} ms'
+        )
+    
+    def signup(self, username, referral_code):
+        serializer = SignupSerializer(data={
+            'username': username,
+            'email': f'{username}@example.com',
+            'password': 'Load-test-password-1',
+            'password_confirm': 'Load-test-password-1',
+            'referral_code': referral_code,
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
@@ -0,0 +1,83 @@
+"""
+Load test for the token-bucket throttle.
+
+Abusive clients hammer the send_message scope as fast as they can while
+normal clients send at a fraction of the configured rate. The report shows
+how many abusive requests were shed, that normal clients were never
+throttled, and the per-request cost of the throttle check.
+"""
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIRequestFactory
+
+from api.throttling import SendMessageThrottle, get_store
+
+
+class _User:
+    is_authenticated = True
+    
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class Command(BaseCommand):
+    help = 'Show abusive clients being shed while normal clients keep their latency'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--abusive', type=int, default=4, help='Abusive client threads')
+        parser.add_argument('--normal', type=int, default=16, help='Normal client threads')
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--normal-interval', type=float, default=1.0,
+                            help='Seconds between requests from a normal client')
+    
+    def handle(self, *args, **options):
+        get_store().clear()
+        factory = APIRequestFactory()
+        deadline = time.perf_counter() + options['seconds']
+        results = {'abusive': [], 'normal': []}
+        lock = threading.Lock()
+        
+        def client(kind, user_id, interval):
+            request = factory.post('/api/messages/send/')
+            request.user = _User(user_id)
+            throttle = SendMessageThrottle()
+            samples = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                allowed = throttle.allow_request(request, None)
+                samples.append((allowed, time.perf_counter() - started))
+                if interval:
+                    time.sleep(interval)
+            with lock:
+                results[kind].extend(samples)
+        
+        threads = [
+            threading.Thread(target=client, args=('abusive', f'abuser-{i}', 0))
+            for i in range(options['abusive'])
+        ] + [
+            threading.Thread(target=client, args=('normal', f'normal-{i}', options['normal_interval']))
+            for i in range(options['normal'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for kind, samples in results.items():
+            allowed = sum(1 for ok, _ in samples if ok)
+            latencies = sorted(cost for _, cost in samples)
+            self.stdout.write(
+                f'{kind:8} requests {len(samples):8}  allowed {allowed:6}  '
+                f'shed {len(samples) - allowed:8}  '
+                f'check p50 {statistics.median(latencies) * 1e6:6.1f}us  '
+                f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e6:6.1f}us'
+            )
+        
+        normal_throttled = sum(1 for ok, _ in results['normal'] if not ok)
+        if normal_throttled:
+            self.stdout.write(self.style.ERROR(f'{normal_throttled} normal requests were throttled'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No normal request was throttled'))
@@ -0,0 +1,35 @@
+"""
+Delete domain events older than OUTBOX_RETENTION_DAYS that every registered
+consumer cursor has already passed.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from api.models import DomainEvent, EventCursor
+
+
+class Command(BaseCommand):
+    help = 'Delete old domain events that all consumers have read'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.OUTBOX_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        events = DomainEvent.objects.filter(created_at__lt=cutoff)
+        slowest = EventCursor.objects.aggregate(position=Min('position'))['position']
+        if slowest is not None:
+            events = events.filter(id__lte=slowest)
+        
+        total = 0
+        while True:
+            ids = list(events.order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            total += DomainEvent.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} domain events'))
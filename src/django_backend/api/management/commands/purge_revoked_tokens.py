@@ -0,0 +1,29 @@
+"""
+Delete revoked-token records whose tokens have expired. An expired token is
+rejected without its record, so this only reclaims space. Run it
+periodically, e.g. hourly from cron.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked-token records of expired tokens'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            hashes = list(
+                RevokedToken.objects.filter(expires_at__lte=now)
+                .values_list('jti_hash', flat=True)[:options['batch_size']]
+            )
+            if not hashes:
+                break
+            total += RevokedToken.objects.filter(jti_hash__in=hashes).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired revoked-token records'))
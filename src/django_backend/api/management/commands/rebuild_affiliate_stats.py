@@ -0,0 +1,37 @@
+"""
+Recompute AffiliateStats from ReferralCommission with one grouped scan.
+Run once after upgrading, or to repair the maintained totals.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from api.models import AffiliateStats, ReferralCommission
+
+
+class Command(BaseCommand):
+    help = 'Rebuild affiliate ranking totals from referral commissions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        totals = (
+            ReferralCommission.objects.values('referrer_id')
+            .annotate(referral_count=Count('id'), total_commission=Sum('amount'))
+            .order_by()
+        )
+        rows = [
+            AffiliateStats(
+                user_id=row['referrer_id'],
+                referral_count=row['referral_count'],
+                total_commission=row['total_commission'] or 0,
+            )
+            for row in totals.iterator()
+        ]
+        
+        with transaction.atomic():
+            AffiliateStats.objects.all().delete()
+            AffiliateStats.objects.bulk_create(rows, batch_size=options['batch_size'])
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(rows)} affiliates'))
@@ -0,0 +1,59 @@
+"""
+Recompute User.referral_path, referral_depth and downline_count from
+referred_by. Run once after upgrading, or after editing referrers by hand.
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import User, referral_path_ids, referral_path_segment
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized referral tree from referred_by'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        
+        # Breadth-first from the roots, one level at a time
+        level = list(User.objects.filter(referred_by__isnull=True).values_list('id', flat=True))
+        User.objects.filter(id__in=level).update(referral_path='', referral_depth=0)
+        paths = {user_id: '' for user_id in level}
+        depth = 0
+        
+        while level:
+            depth += 1
+            next_level = []
+            for start in range(0, len(level), batch_size):
+                parents = level[start:start + batch_size]
+                children = list(
+                    User.objects.filter(referred_by_id__in=parents).only('id', 'referred_by_id')
+                )
+                for child in children:
+                    child.referral_path = paths[child.referred_by_id] + referral_path_segment(child.referred_by_id)
+                    child.referral_depth = depth
+                    paths[child.id] = child.referral_path
+                    next_level.append(child.id)
+                with transaction.atomic():
+                    User.objects.bulk_update(children, ['referral_path', 'referral_depth'], batch_size=batch_size)
+            self.stdout.write(f'Level {depth}: {len(next_level)} users')
+            level = next_level
+        
+        unreachable = User.objects.count() - len(paths)
+        
+        # Every ancestor in a path gains one descendant
+        counts = Counter()
+        for path in paths.values():
+            counts.update(referral_path_ids(path))
+        
+        updates = [User(id=user_id, downline_count=counts.get(user_id, 0)) for user_id in paths]
+        with transaction.atomic():
+            User.objects.bulk_update(updates, ['downline_count'], batch_size=batch_size)
+        
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt referral tree for {len(paths)} users'))
+        if unreachable:
+            self.stdout.write(self.style.WARNING(f'{unreachable} users sit in a referral cycle and were skipped'))
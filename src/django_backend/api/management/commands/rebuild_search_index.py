@@ -0,0 +1,44 @@
+"""
+Backfill or repair the full-text search documents for users, transactions
+and messages. Signals keep documents current after this has run once.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import SearchDocument
+from api.search import INDEXED_MODELS, index_instance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search documents'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true', help='Delete all documents first')
+    
+    def handle(self, *args, **options):
+        if options['clear']:
+            SearchDocument.objects.all().delete()
+        
+        for model, (kind, _, fields) in INDEXED_MODELS.items():
+            indexed = 0
+            last_id = 0
+            while True:
+                batch = list(
+                    model.objects.filter(id__gt=last_id).order_by('id')
+                    .only('id', *fields)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                with transaction.atomic():
+                    for instance in batch:
+                        index_instance(instance)
+                indexed += len(batch)
+                last_id = batch[-1].id
+            
+            # Drop documents whose rows were deleted without signals
+            live_ids = model.objects.values('id')
+            stale = SearchDocument.objects.filter(kind=kind).exclude(object_id__in=live_ids).delete()[0]
+            self.stdout.write(f'{kind}: {indexed} indexed, {stale} stale removed')
+        
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
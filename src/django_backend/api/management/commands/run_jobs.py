@@ -0,0 +1,59 @@
+"""
+Job worker. Polls the Job table, claims due jobs (including ones whose lease
+expired because a previous worker died) and runs them with retries. Run one
+or more of these next to the web processes, e.g. under systemd or supervisor.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from api import jobs
+from api.models import Job
+
+
+def _execute(record):
+    close_old_connections()
+    try:
+        return jobs.execute(record)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--once', action='store_true', help='Drain due jobs and exit')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Requeue permanently failed jobs before starting')
+    
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = Job.objects.filter(status='failed').update(
+                status='queued', attempts=0, run_at=timezone.now()
+            )
+            self.stdout.write(f'Requeued {requeued} failed jobs')
+        
+        succeeded = failed = 0
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            while True:
+                batch = jobs.claim_batch(options['batch_size'])
+                for ok in pool.map(_execute, batch):
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                if batch:
+                    continue
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(options['poll_interval'])
+        
+        self.stdout.write(self.style.SUCCESS(f'{succeeded} jobs succeeded, {failed} failed'))
@@ -0,0 +1,44 @@
+"""
+Stream domain events to stdout as JSON lines for a named consumer.
+
+The consumer's cursor advances after each batch is written, so a consumer
+that crashes mid-batch sees that batch again (at-least-once); downstream
+systems should de-duplicate on the event id.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import DomainEvent, EventCursor
+from api.serializers import DomainEventSerializer
+
+
+class Command(BaseCommand):
+    help = 'Write domain events after a consumer cursor as JSON lines'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', required=True)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--type', action='append', dest='types', help='Only these event types')
+        parser.add_argument('--follow', action='store_true', help='Keep polling for new events')
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+    
+    def handle(self, *args, **options):
+        consumer = options['consumer']
+        position = EventCursor.position_for(consumer)
+        while True:
+            events = DomainEvent.visible().filter(id__gt=position)
+            if options['types']:
+                events = events.filter(type__in=options['types'])
+            batch = list(events.order_by('id')[:options['batch_size']])
+            for row in DomainEventSerializer(batch, many=True).data:
+                self.stdout.write(json.dumps(row, default=str))
+            self.stdout.flush()
+            if batch:
+                position = batch[-1].id
+                EventCursor.advance(consumer, position)
+                continue
+            if not options['follow']:
+                break
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,83 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .db_routers import SAFE_METHODS, pin_to_primary
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+BROTLI_QUALITY = 5  # Close to gzip's CPU cost for noticeably smaller JSON
+
+_accept_encoding_re = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([01](?:\.\d*)?))?\s*$')
+
+
+class PrimaryStickinessMiddleware:
+    """Pin users to the primary database right after a successful write"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # DRF copies the JWT-authenticated user onto the Django request
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.id)
+        return response
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts, ignoring any it gives q=0"""
+    accepted = set()
+    for part in header.split(','):
+        match = _accept_encoding_re.match(part)
+        if match and (match[2] is None or float(match[2]) > 0):
+            accepted.add(match[1].lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Brotli/gzip responses under COMPRESS_PATHS of at least COMPRESS_MIN_SIZE
+    bytes. Brotli is used when the brotli package is installed and the client
+    accepts it.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not request.path.startswith(tuple(settings.COMPRESS_PATHS))
+            or len(response.content) < settings.COMPRESS_MIN_SIZE
+        ):
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding, compressed = 'br', brotli.compress(response.content, quality=BROTLI_QUALITY)
+        elif 'gzip' in accepted or '*' in accepted:
+            encoding, compressed = 'gzip', compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+        
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The compressed body is no longer byte-for-byte what a strong ETag promised
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,516 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:59
+
+import api.storage
+from django.conf import settings
+import django.contrib.auth.models
+import django.contrib.auth.validators
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=150, unique=True, validators=[django.contrib.auth.validators.UnicodeUsernameValidator()], verbose_name='username')),
+                ('first_name', models.CharField(blank=True, max_length=150, verbose_name='first name')),
+                ('last_name', models.CharField(blank=True, max_length=150, verbose_name='last name')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('referral_code', models.CharField(blank=True, max_length=10, unique=True)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('is_kyc_verified', models.BooleanField(default=False)),
+                ('role', models.CharField(choices=[('customer', 'Customer'), ('admin', 'Admin')], default='customer', max_length=10)),
+                ('language', models.CharField(choices=[('en', 'English'), ('ar', 'Arabic')], default='en', max_length=2)),
+                ('referral_path', models.CharField(blank=True, default='', editable=False, max_length=1024)),
+                ('referral_depth', models.PositiveIntegerField(default=0, editable=False)),
+                ('downline_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('offer_platform', models.CharField(blank=True, max_length=20)),
+                ('submitted_link', models.URLField(blank=True)),
+                ('link_status', models.CharField(blank=True, max_length=10)),
+                ('is_read', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('earning', 'Earning'), ('referral_commission', 'Referral Commission'), ('referral_reward', 'Referral Reward')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('completed', 'Completed')], max_length=10)),
+                ('wallet_address', models.CharField(blank=True, max_length=200)),
+                ('transaction_hash', models.CharField(blank=True, max_length=200)),
+                ('admin_note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DomainEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=50)),
+                ('user_id', models.BigIntegerField(null=True)),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EventCursor',
+            fields=[
+                ('consumer', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(null=True)),
+                ('response_body', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InvestmentPack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('min_amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('max_amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('daily_return_rate', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('duration_days', models.IntegerField(default=60)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['run_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='KYCVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full_name', models.CharField(max_length=200)),
+                ('date_of_birth', models.DateField()),
+                ('country', models.CharField(max_length=100)),
+                ('id_type', models.CharField(max_length=50)),
+                ('id_number', models.CharField(max_length=100)),
+                ('id_front_image', models.ImageField(storage=api.storage.kyc_storage, upload_to='kyc/id_front/')),
+                ('id_back_image', models.ImageField(blank=True, null=True, storage=api.storage.kyc_storage, upload_to='kyc/id_back/')),
+                ('selfie_image', models.ImageField(storage=api.storage.kyc_storage, upload_to='kyc/selfie/')),
+                ('id_front_thumbnail', models.ImageField(blank=True, null=True, storage=api.storage.kyc_storage, upload_to='kyc/thumbnails/')),
+                ('id_back_thumbnail', models.ImageField(blank=True, null=True, storage=api.storage.kyc_storage, upload_to='kyc/thumbnails/')),
+                ('selfie_thumbnail', models.ImageField(blank=True, null=True, storage=api.storage.kyc_storage, upload_to='kyc/thumbnails/')),
+                ('image_status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=10)),
+                ('admin_note', models.TextField(blank=True)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('offer_platform', models.CharField(blank=True, choices=[('facebook', 'Facebook'), ('instagram', 'Instagram'), ('youtube', 'YouTube')], max_length=20)),
+                ('submitted_link', models.URLField(blank=True)),
+                ('link_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], max_length=10)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReferralAchievement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reward_amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('achieved_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReferralCommission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReferralPack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('required_referrals', models.IntegerField()),
+                ('reward_amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('icon', models.CharField(default='trophy', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['required_referrals'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField()),
+                ('kind', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=10)),
+                ('pack_key', models.PositiveIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('jti_hash', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField()),
+                ('revoked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'User'), ('transaction', 'Transaction'), ('message', 'Message')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AffiliateStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='affiliate_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('referral_count', models.PositiveIntegerField(default=0)),
+                ('total_commission', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InboxCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inbox_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserInvestment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('start_date', models.DateField(auto_now_add=True)),
+                ('end_date', models.DateField()),
+                ('daily_return', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('total_return', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='active', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pack', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='api.investmentpack')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='investments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('earning', 'Earning'), ('referral_commission', 'Referral Commission'), ('referral_reward', 'Referral Reward')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('completed', 'Completed')], default='pending', max_length=10)),
+                ('wallet_address', models.CharField(blank=True, max_length=200)),
+                ('transaction_hash', models.CharField(blank=True, max_length=200)),
+                ('admin_note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='search_document_key'),
+        ),
+        migrations.AddIndex(
+            model_name='revokedtoken',
+            index=models.Index(fields=['expires_at'], name='revoked_token_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='revokedtoken',
+            index=models.Index(fields=['revoked_at'], name='revoked_token_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reportrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'bucket', 'kind', 'status', 'pack_key'), name='report_rollup_key'),
+        ),
+        migrations.AddField(
+            model_name='referralcommission',
+            name='investment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='api.userinvestment'),
+        ),
+        migrations.AddField(
+            model_name='referralcommission',
+            name='referred_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='referred_from', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='referralcommission',
+            name='referrer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commissions_earned', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='referralachievement',
+            name='pack',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievements', to='api.referralpack'),
+        ),
+        migrations.AddField(
+            model_name='referralachievement',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='referral_achievements', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='recipient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='received_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sent_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='kycverification',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='kyc', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_at'], name='job_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='idempotencyrecord',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_records', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='domainevent',
+            index=models.Index(fields=['type', 'id'], name='domain_event_type_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtransaction',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='recipient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_received_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedmessage',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_sent_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='groups',
+            field=models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='referred_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='referrals', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='user_permissions',
+            field=models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions'),
+        ),
+        migrations.AddIndex(
+            model_name='userinvestment',
+            index=models.Index(fields=['status', 'start_date'], name='investment_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinvestment',
+            index=models.Index(fields=['pack', 'start_date'], name='investment_pack_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinvestment',
+            index=models.Index(fields=['start_date'], name='investment_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinvestment',
+            index=models.Index(fields=['amount'], name='investment_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinvestment',
+            index=models.Index(fields=['status', 'end_date', 'start_date', 'daily_return', 'amount'], name='investment_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', '-created_at'], name='transaction_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['type', 'status', 'created_at'], name='transaction_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['type', 'created_at'], name='transaction_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['type', 'amount'], name='transaction_type_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet_address'], name='transaction_wallet_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_hash'], name='transaction_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at', 'id'], name='transaction_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='referralachievement',
+            constraint=models.UniqueConstraint(fields=('user', 'pack'), name='referral_achievement_user_pack'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', 'is_read', 'id'], name='message_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_at', 'id'], name='message_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kycverification',
+            index=models.Index(fields=['status', 'submitted_at'], name='kyc_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kycverification',
+            index=models.Index(fields=['image_status', 'submitted_at'], name='kyc_image_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kycverification',
+            index=models.Index(fields=['submitted_at'], name='kyc_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='idempotencyrecord',
+            index=models.Index(fields=['expires_at'], name='idempotency_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencyrecord',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='idempotency_user_key'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['user', '-created_at'], name='archived_tx_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmessage',
+            index=models.Index(fields=['sender', '-created_at'], name='archived_msg_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedmessage',
+            index=models.Index(fields=['recipient', '-created_at'], name='archived_msg_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='affiliatestats',
+            index=models.Index(fields=['-total_commission', 'user'], name='affiliate_commission_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='affiliatestats',
+            index=models.Index(fields=['-referral_count', 'user'], name='affiliate_referral_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['referral_path', 'referral_depth'], name='user_referral_tree_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'created_at'], name='user_role_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'balance'], name='user_role_balance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='user_email_idx'),
+        ),
+    ]
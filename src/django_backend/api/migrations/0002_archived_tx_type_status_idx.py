@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedtransaction',
+            index=models.Index(fields=['type', 'status', 'amount'], name='archived_tx_type_status_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+"""
+Full-text index objects for SearchDocument (see api/search.py).
+
+SQLite gets an external-content FTS5 table kept in sync by triggers, using
+the trigram tokenizer where the SQLite library has it (3.34+) and whole
+words otherwise. Postgres gets pg_trgm and GIN indexes on a 'simple'
+tsvector and on trigrams. Other databases get nothing and search with a
+substring scan. IF NOT EXISTS keeps databases where earlier versions
+created these objects at runtime migrating cleanly.
+"""
+import sqlite3
+
+from django.db import migrations
+
+TABLE = 'api_searchdocument'
+FTS = f'{TABLE}_fts'
+TOKENIZER = 'trigram' if sqlite3.sqlite_version_info >= (3, 34, 0) else 'unicode61'
+
+SQLITE_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS} USING fts5("
+    f"title, body, content='{TABLE}', content_rowid='id', tokenize='{TOKENIZER}')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_ai AFTER INSERT ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_ad AFTER DELETE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_au AFTER UPDATE ON {TABLE} BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    f"INSERT INTO {FTS}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    # Index documents that already exist
+    f"INSERT INTO {FTS}({FTS}) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS}_au",
+    f"DROP TRIGGER IF EXISTS {FTS}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS}_ai",
+    f"DROP TABLE IF EXISTS {FTS}",
+]
+
+POSTGRES_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS search_document_tsv_idx ON {TABLE} "
+    f"USING gin (to_tsvector('simple', title || ' ' || body))",
+    f"CREATE INDEX IF NOT EXISTS search_document_trgm_idx ON {TABLE} "
+    f"USING gin ((title || ' ' || body) gin_trgm_ops)",
+]
+
+# pg_trgm stays installed: other objects may use it
+POSTGRES_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS search_document_trgm_idx",
+    "DROP INDEX IF EXISTS search_document_tsv_idx",
+]
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """RunSQL that only applies on one database vendor"""
+
+    def __init__(self, vendor, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vendor = vendor
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_archived_tx_type_status_idx'),
+    ]
+
+    operations = [
+        VendorRunSQL('sqlite', SQLITE_SQL, SQLITE_REVERSE_SQL),
+        VendorRunSQL('postgresql', POSTGRES_SQL, POSTGRES_REVERSE_SQL),
+    ]
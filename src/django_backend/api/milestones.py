@@ -0,0 +1,91 @@
+"""
+Referral milestone rewards.
+
+A ReferralPack pays its reward_amount once a referrer has earned
+required_referrals commissions. Commissions are counted one at a time
+(AffiliateStats.referral_count), so after each one the only thresholds
+worth checking are those between the previous count and the new one. They
+are found by bisecting a sorted per-process copy of the packs, reloaded
+whenever the catalog version changes (see api/versioning.py), and at least
+every RELOAD_INTERVAL seconds for processes that cannot see the version
+bumps of others (no shared cache). A commission that crosses no threshold,
+which is almost all of them, costs no query.
+
+A reward is credited in the same transaction that inserts its
+ReferralAchievement row. The row's unique (user, pack) constraint makes the
+credit happen exactly once, even when a job is retried or the backfill
+(backfill_referral_rewards) runs at the same time.
+"""
+import bisect
+import threading
+import time
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DomainEvent, ReferralAchievement, ReferralPack, Transaction, User
+from .versioning import catalog_version
+
+Milestone = namedtuple('Milestone', 'required_referrals pack_id reward_amount')
+
+RELOAD_INTERVAL = 60
+
+_lock = threading.Lock()
+# (catalog version, time.monotonic() of the load, milestones sorted by threshold, their thresholds)
+_loaded = (None, 0.0, [], [])
+
+
+def _stale(version):
+    return _loaded[0] != version or time.monotonic() - _loaded[1] >= RELOAD_INTERVAL
+
+
+def milestones():
+    """All referral packs as Milestones sorted by required_referrals, and the thresholds"""
+    global _loaded
+    version = catalog_version()
+    if _stale(version):
+        with _lock:
+            if _stale(version):
+                rows = (
+                    ReferralPack.objects.order_by('required_referrals', 'id')
+                    .values_list('required_referrals', 'id', 'reward_amount')
+                )
+                items = [Milestone(*row) for row in rows]
+                _loaded = (version, time.monotonic(), items, [item.required_referrals for item in items])
+    return _loaded[2], _loaded[3]
+
+
+def crossed(previous_count, count):
+    """Milestones with previous_count < required_referrals <= count"""
+    items, thresholds = milestones()
+    return items[bisect.bisect_right(thresholds, previous_count):bisect.bisect_right(thresholds, count)]
+
+
+def award(user_id, milestone):
+    """Credit a milestone's reward unless the user already has it; True if credited"""
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                ReferralAchievement.objects.create(
+                    user_id=user_id,
+                    pack_id=milestone.pack_id,
+                    reward_amount=milestone.reward_amount
+                )
+        except IntegrityError:
+            return False
+        
+        User.objects.filter(id=user_id).update(balance=F('balance') + milestone.reward_amount)
+        DomainEvent.emit('balance.changed', user_id, delta=milestone.reward_amount)
+        Transaction.objects.create(
+            user_id=user_id,
+            type='referral_reward',
+            amount=milestone.reward_amount,
+            status='completed'
+        )
+    return True
+
+
+def record_referral(user_id, count):
+    """Award the milestones a referrer reached with their count-th referral"""
+    return [milestone for milestone in crossed(count - 1, count) if award(user_id, milestone)]
@@ -1,9 +1,43 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest, Substr
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import secrets
 import string
 from datetime import timedelta, date
+from decimal import Decimal
+
+from .storage import kyc_storage
+
+
+REFERRAL_SEGMENT_WIDTH = 7
+REFERRAL_CODE_ATTEMPTS = 5
+
+
+def money(value):
+    """Normalize an amount to the two decimal places the money columns store"""
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def referral_path_segment(user_id):
+    """Fixed-width base-36 encoding of a user id for User.referral_path"""
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    encoded = ''
+    while user_id:
+        user_id, remainder = divmod(user_id, 36)
+        encoded = digits[remainder] + encoded
+    return encoded.rjust(REFERRAL_SEGMENT_WIDTH, '0')
+
+
+def referral_path_ids(path):
+    """Decode a referral path into ancestor ids, root first"""
+    return [
+        int(path[i:i + REFERRAL_SEGMENT_WIDTH], 36)
+        for i in range(0, len(path), REFERRAL_SEGMENT_WIDTH)
+    ]
 
 
 class User(AbstractUser):
@@ -31,21 +65,110 @@ class User(AbstractUser):
     is_kyc_verified = models.BooleanField(default=False)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='customer')
     language = models.CharField(max_length=2, choices=LANGUAGE_CHOICES, default='en')
+    # Referral tree as a materialized path of ancestor ids (see referral_path_segment)
+    referral_path = models.CharField(max_length=1024, blank=True, default='', editable=False)
+    referral_depth = models.PositiveIntegerField(default=0, editable=False)
+    downline_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['referral_path', 'referral_depth'], name='user_referral_tree_idx'),
+            # Admin user list filters and prefix search (api/filters.py)
+            models.Index(fields=['role', 'created_at'], name='user_role_created_idx'),
+            models.Index(fields=['role', 'balance'], name='user_role_balance_idx'),
+            models.Index(fields=['email'], name='user_email_idx'),
+        ]
+    
     def save(self, *args, **kwargs):
-        if not self.referral_code:
+        generated_code = not self.referral_code
+        if generated_code:
             self.referral_code = self.generate_referral_code()
-        super().save(*args, **kwargs)
+        
+        adding = self._state.adding
+        if adding and self.referred_by_id:
+            referrer = self.referred_by
+            self.referral_path = referrer.referral_path + referral_path_segment(referrer.id)
+            self.referral_depth = referrer.referral_depth + 1
+        
+        update_fields = kwargs.get('update_fields')
+        old_balance = getattr(self, '_loaded_balance', None)
+        balance_changed = (
+            not adding
+            and old_balance is not None
+            and (update_fields is None or 'balance' in update_fields)
+            and money(self.balance) != old_balance
+        )
+        for attempt in range(1, REFERRAL_CODE_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                    if adding and self.referred_by_id:
+                        User.objects.filter(id__in=self.referral_ancestor_ids()).update(
+                            downline_count=F('downline_count') + 1
+                        )
+                    if balance_changed:
+                        new_balance = money(self.balance)
+                        DomainEvent.emit(
+                            'balance.changed', self.id,
+                            old_balance=old_balance, new_balance=new_balance, delta=new_balance - old_balance
+                        )
+                break
+            except IntegrityError as exc:
+                # Codes are drawn without a lookup first; on the rare duplicate,
+                # draw again rather than pay an extra query on every signup
+                if not generated_code or 'referral_code' not in str(exc) or attempt == REFERRAL_CODE_ATTEMPTS:
+                    raise
+                self.referral_code = self.generate_referral_code()
+        self._loaded_balance = money(self.balance)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # The stored path and count, not this instance's possibly stale copy
+            tree = User.objects.select_for_update().filter(id=self.id).values(
+                'referral_path', 'referral_depth', 'downline_count'
+            ).first()
+            if tree is not None:
+                self.referral_path = tree['referral_path']
+                self.referral_depth = tree['referral_depth']
+                # The upline loses this user and their whole downline: with
+                # referred_by set to NULL, the direct referrals become roots
+                User.objects.filter(id__in=self.referral_ancestor_ids()).update(
+                    downline_count=Greatest(F('downline_count') - (1 + tree['downline_count']), 0)
+                )
+                prefix = self.referral_path + referral_path_segment(self.id)
+                self.downline().update(
+                    referral_path=Substr('referral_path', len(prefix) + 1),
+                    referral_depth=F('referral_depth') - (self.referral_depth + 1)
+                )
+            return super().delete(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_balance = instance.__dict__.get('balance')
+        return instance
+    
+    def referral_ancestor_ids(self):
+        """Ids of every upline referrer, root first"""
+        return referral_path_ids(self.referral_path)
+    
+    def downline(self, max_depth=None):
+        """Every user below this one in the referral tree, as one range scan"""
+        prefix = self.referral_path + referral_path_segment(self.id)
+        # Fixed-width alphanumeric segments sort so that the next sibling's
+        # prefix bounds this subtree without relying on LIKE or collation rules
+        upper = self.referral_path + referral_path_segment(self.id + 1)
+        queryset = User.objects.filter(referral_path__gte=prefix, referral_path__lt=upper)
+        if max_depth is not None:
+            queryset = queryset.filter(referral_depth__lte=self.referral_depth + max_depth)
+        return queryset
     
     @staticmethod
     def generate_referral_code():
-        """Generate unique 8-character referral code"""
-        while True:
-            code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
-            if not User.objects.filter(referral_code=code).exists():
-                return code
+        """Random 8-character referral code; uniqueness is enforced on insert"""
+        return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
 
 
 class InvestmentPack(models.Model):
@@ -80,12 +203,74 @@ class UserInvestment(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        # Admin investment list filters (api/filters.py)
+        indexes = [
+            models.Index(fields=['status', 'start_date'], name='investment_status_idx'),
+            models.Index(fields=['pack', 'start_date'], name='investment_pack_idx'),
+            models.Index(fields=['start_date'], name='investment_start_idx'),
+            models.Index(fields=['amount'], name='investment_amount_idx'),
+            # Covers the liability report's grouped scan of active investments
+            models.Index(
+                fields=['status', 'end_date', 'start_date', 'daily_return', 'amount'],
+                name='investment_schedule_idx'
+            ),
+        ]
+    
     def save(self, *args, **kwargs):
         if not self.end_date:
-            self.end_date = self.start_date + timedelta(days=self.pack.duration_days)
+            # start_date is only filled in by auto_now_add during the insert
+            start_date = self.start_date or date.today()
+            self.end_date = start_date + timedelta(days=self.pack.duration_days)
         if not self.daily_return:
             self.daily_return = (self.amount * self.pack.daily_return_rate) / 100
-        super().save(*args, **kwargs)
+        
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                ReportRollup.record('investment', self.status, self.amount, self.start_date, pack_key=self.pack_id)
+                DomainEvent.emit(
+                    'investment.created', self.user_id,
+                    investment_id=self.id, pack_id=self.pack_id, amount=money(self.amount), status=self.status
+                )
+            elif getattr(self, '_loaded_status', None) not in (None, self.status):
+                ReportRollup.move(
+                    'investment', self._loaded_status, self.status, self.amount, self.start_date,
+                    pack_key=self.pack_id
+                )
+                DomainEvent.emit(
+                    'investment.status_changed', self.user_id,
+                    investment_id=self.id, old_status=self._loaded_status, status=self.status
+                )
+        self._loaded_status = self.status
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # The stored path and count, not this instance's possibly stale copy
+            tree = User.objects.select_for_update().filter(id=self.id).values(
+                'referral_path', 'referral_depth', 'downline_count'
+            ).first()
+            if tree is not None:
+                self.referral_path = tree['referral_path']
+                self.referral_depth = tree['referral_depth']
+                # The upline loses this user and their whole downline: with
+                # referred_by set to NULL, the direct referrals become roots
+                User.objects.filter(id__in=self.referral_ancestor_ids()).update(
+                    downline_count=Greatest(F('downline_count') - (1 + tree['downline_count']), 0)
+                )
+                prefix = self.referral_path + referral_path_segment(self.id)
+                self.downline().update(
+                    referral_path=Substr('referral_path', len(prefix) + 1),
+                    referral_depth=F('referral_depth') - (self.referral_depth + 1)
+                )
+            return super().delete(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
     
     @property
     def days_elapsed(self):
@@ -102,6 +287,7 @@ class Transaction(models.Model):
         ('withdrawal', 'Withdrawal'),
         ('earning', 'Earning'),
         ('referral_commission', 'Referral Commission'),
+        ('referral_reward', 'Referral Reward'),
     ]
     
     STATUS_CHOICES = [
@@ -123,6 +309,142 @@ class Transaction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='transaction_user_idx'),
+            # Admin deposit/withdrawal list filters and prefix search (api/filters.py)
+            models.Index(fields=['type', 'status', 'created_at'], name='transaction_type_status_idx'),
+            models.Index(fields=['type', 'created_at'], name='transaction_type_created_idx'),
+            models.Index(fields=['type', 'amount'], name='transaction_type_amount_idx'),
+            models.Index(fields=['wallet_address'], name='transaction_wallet_idx'),
+            models.Index(fields=['transaction_hash'], name='transaction_hash_idx'),
+            # Unfiltered admin changelist: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['created_at', 'id'], name='transaction_created_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            day = timezone.localdate(self.created_at)
+            if adding:
+                ReportRollup.record(self.type, self.status, self.amount, day)
+                DomainEvent.emit(
+                    'transaction.created', self.user_id,
+                    transaction_id=self.id, type=self.type, amount=money(self.amount), status=self.status
+                )
+            elif getattr(self, '_loaded_status', None) not in (None, self.status):
+                ReportRollup.move(self.type, self._loaded_status, self.status, self.amount, day)
+                DomainEvent.emit(
+                    'transaction.status_changed', self.user_id,
+                    transaction_id=self.id, type=self.type, amount=money(self.amount),
+                    old_status=self._loaded_status, status=self.status
+                )
+        self._loaded_status = self.status
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # The stored path and count, not this instance's possibly stale copy
+            tree = User.objects.select_for_update().filter(id=self.id).values(
+                'referral_path', 'referral_depth', 'downline_count'
+            ).first()
+            if tree is not None:
+                self.referral_path = tree['referral_path']
+                self.referral_depth = tree['referral_depth']
+                # The upline loses this user and their whole downline: with
+                # referred_by set to NULL, the direct referrals become roots
+                User.objects.filter(id__in=self.referral_ancestor_ids()).update(
+                    downline_count=Greatest(F('downline_count') - (1 + tree['downline_count']), 0)
+                )
+                prefix = self.referral_path + referral_path_segment(self.id)
+                self.downline().update(
+                    referral_path=Substr('referral_path', len(prefix) + 1),
+                    referral_depth=F('referral_depth') - (self.referral_depth + 1)
+                )
+            return super().delete(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+
+class ArchivedTransaction(models.Model):
+    """Settled transactions moved out of the hot table by archive_history"""
+    id = models.BigIntegerField(primary_key=True)  # Original Transaction id
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_transactions')
+    type = models.CharField(max_length=20, choices=Transaction.TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+    status = models.CharField(max_length=10, choices=Transaction.STATUS_CHOICES)
+    wallet_address = models.CharField(max_length=200, blank=True)
+    transaction_hash = models.CharField(max_length=200, blank=True)
+    admin_note = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_tx_user_idx'),
+            # Covers the admin dashboard's archived earnings total
+            models.Index(fields=['type', 'status', 'amount'], name='archived_tx_type_status_idx'),
+        ]
+
+
+class ReportRollup(models.Model):
+    """Transaction and investment volumes pre-aggregated per time bucket"""
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+    
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    bucket = models.DateField()  # First day of the day/week/month
+    kind = models.CharField(max_length=20)  # Transaction.type or 'investment'
+    status = models.CharField(max_length=10)
+    pack_key = models.PositiveIntegerField(default=0)  # InvestmentPack id, 0 when not pack-specific
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'bucket', 'kind', 'status', 'pack_key'],
+                name='report_rollup_key'
+            ),
+        ]
+    
+    @staticmethod
+    def buckets(day):
+        """(period, bucket start) pairs a date contributes to"""
+        return [
+            ('day', day),
+            ('week', day - timedelta(days=day.weekday())),
+            ('month', day.replace(day=1)),
+        ]
+    
+    @classmethod
+    def record(cls, kind, status, amount, day, pack_key=0, count=1):
+        """Add count rows totalling amount to every bucket containing day"""
+        amount = Decimal(str(amount)) * count
+        for period, bucket in cls.buckets(day):
+            key = {'period': period, 'bucket': bucket, 'kind': kind, 'status': status, 'pack_key': pack_key}
+            updates = {'count': F('count') + count, 'amount': F('amount') + amount}
+            if cls.objects.filter(**key).update(**updates):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(**key, count=count, amount=amount)
+            except IntegrityError:
+                cls.objects.filter(**key).update(**updates)
+    
+    @classmethod
+    def move(cls, kind, old_status, new_status, amount, day, pack_key=0):
+        """Shift one row from old_status to new_status"""
+        cls.record(kind, old_status, amount, day, pack_key=pack_key, count=-1)
+        cls.record(kind, new_status, amount, day, pack_key=pack_key)
 
 
 class ReferralPack(models.Model):
@@ -149,6 +471,74 @@ class ReferralCommission(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+class ReferralAchievement(models.Model):
+    """A referral milestone reached, and its reward credited, once per user and pack"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='referral_achievements')
+    pack = models.ForeignKey(ReferralPack, on_delete=models.CASCADE, related_name='achievements')
+    reward_amount = models.DecimalField(max_digits=20, decimal_places=2)
+    achieved_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'pack'], name='referral_achievement_user_pack'),
+        ]
+
+
+class AffiliateStats(models.Model):
+    """Maintained commission totals per referrer, indexed for rankings"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='affiliate_stats'
+    )
+    referral_count = models.PositiveIntegerField(default=0)
+    total_commission = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    RANKINGS = {
+        'commission': 'total_commission',
+        'referrals': 'referral_count',
+    }
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_commission', 'user'], name='affiliate_commission_rank_idx'),
+            models.Index(fields=['-referral_count', 'user'], name='affiliate_referral_rank_idx'),
+        ]
+    
+    @classmethod
+    def record_commission(cls, user_id, amount):
+        """Add one commission to a referrer's totals"""
+        updates = {
+            'referral_count': F('referral_count') + 1,
+            'total_commission': F('total_commission') + amount,
+        }
+        if cls.objects.filter(user_id=user_id).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, referral_count=1, total_commission=amount)
+        except IntegrityError:
+            # Created concurrently; apply on top of it
+            cls.objects.filter(user_id=user_id).update(**updates)
+    
+    @classmethod
+    def ranked(cls, ranking):
+        """All affiliates in rank order, served straight from the ranking index"""
+        field = cls.RANKINGS[ranking]
+        return cls.objects.select_related('user').order_by(f'-{field}', 'user_id')
+    
+    def rank(self, ranking):
+        """1-based position of this affiliate, counted along the ranking index"""
+        field = self.RANKINGS[ranking]
+        value = getattr(self, field)
+        ahead = AffiliateStats.objects.filter(
+            Q(**{f'{field}__gt': value}) | Q(**{field: value, 'user_id__lt': self.user_id})
+        ).count()
+        return ahead + 1
+
+
 class KYCVerification(models.Model):
     """KYC verification documents"""
     STATUS_CHOICES = [
@@ -157,19 +547,84 @@ class KYCVerification(models.Model):
         ('rejected', 'Rejected'),
     ]
     
+    IMAGE_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='kyc')
     full_name = models.CharField(max_length=200)
     date_of_birth = models.DateField()
     country = models.CharField(max_length=100)
     id_type = models.CharField(max_length=50)
     id_number = models.CharField(max_length=100)
-    id_front_image = models.ImageField(upload_to='kyc/id_front/')
-    id_back_image = models.ImageField(upload_to='kyc/id_back/', blank=True, null=True)
-    selfie_image = models.ImageField(upload_to='kyc/selfie/')
+    id_front_image = models.ImageField(upload_to='kyc/id_front/', storage=kyc_storage)
+    id_back_image = models.ImageField(upload_to='kyc/id_back/', storage=kyc_storage, blank=True, null=True)
+    selfie_image = models.ImageField(upload_to='kyc/selfie/', storage=kyc_storage)
+    id_front_thumbnail = models.ImageField(
+        upload_to='kyc/thumbnails/', storage=kyc_storage, blank=True, null=True
+    )
+    id_back_thumbnail = models.ImageField(
+        upload_to='kyc/thumbnails/', storage=kyc_storage, blank=True, null=True
+    )
+    selfie_thumbnail = models.ImageField(
+        upload_to='kyc/thumbnails/', storage=kyc_storage, blank=True, null=True
+    )
+    image_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, default='pending')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     admin_note = models.TextField(blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
     reviewed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        # Admin KYC list filters (api/filters.py)
+        indexes = [
+            models.Index(fields=['status', 'submitted_at'], name='kyc_status_idx'),
+            models.Index(fields=['image_status', 'submitted_at'], name='kyc_image_status_idx'),
+            models.Index(fields=['submitted_at'], name='kyc_submitted_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        reviewed = not adding and getattr(self, '_loaded_status', None) not in (None, self.status)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                DomainEvent.emit('kyc.submitted', self.user_id, kyc_id=self.id)
+            elif reviewed:
+                DomainEvent.emit(
+                    'kyc.reviewed', self.user_id,
+                    kyc_id=self.id, old_status=self._loaded_status, status=self.status
+                )
+        self._loaded_status = self.status
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # The stored path and count, not this instance's possibly stale copy
+            tree = User.objects.select_for_update().filter(id=self.id).values(
+                'referral_path', 'referral_depth', 'downline_count'
+            ).first()
+            if tree is not None:
+                self.referral_path = tree['referral_path']
+                self.referral_depth = tree['referral_depth']
+                # The upline loses this user and their whole downline: with
+                # referred_by set to NULL, the direct referrals become roots
+                User.objects.filter(id__in=self.referral_ancestor_ids()).update(
+                    downline_count=Greatest(F('downline_count') - (1 + tree['downline_count']), 0)
+                )
+                prefix = self.referral_path + referral_path_segment(self.id)
+                self.downline().update(
+                    referral_path=Substr('referral_path', len(prefix) + 1),
+                    referral_depth=F('referral_depth') - (self.referral_depth + 1)
+                )
+            return super().delete(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
 
 
 class Message(models.Model):
@@ -202,3 +657,232 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', 'id'], name='message_inbox_idx'),
+            # Unfiltered admin changelist: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['created_at', 'id'], name='message_created_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.is_read:
+                InboxCounter.adjust(self.recipient_id, 1)
+            DomainEvent.emit(
+                'message.sent', self.recipient_id,
+                message_id=self.id, sender_id=self.sender_id, subject=self.subject
+            )
+
+
+class ArchivedMessage(models.Model):
+    """Read, settled messages moved out of the hot table by archive_history"""
+    id = models.BigIntegerField(primary_key=True)  # Original Message id
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_sent_messages')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_received_messages')
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    offer_platform = models.CharField(max_length=20, blank=True)
+    submitted_link = models.URLField(blank=True)
+    link_status = models.CharField(max_length=10, blank=True)
+    is_read = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['sender', '-created_at'], name='archived_msg_sender_idx'),
+            models.Index(fields=['recipient', '-created_at'], name='archived_msg_recipient_idx'),
+        ]
+
+
+class InboxCounter(models.Model):
+    """Maintained per-user unread message count"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='inbox_counter'
+    )
+    unread_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @classmethod
+    def unread_for(cls, user_id):
+        """Read the unread count with a single primary-key lookup"""
+        count = cls.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first()
+        if count is None:
+            count = cls.rebuild(user_id)
+        return count
+    
+    @classmethod
+    def adjust(cls, user_id, delta):
+        """Apply a delta after messages were sent or marked read"""
+        if not delta:
+            return
+        updated = cls.objects.filter(user_id=user_id).update(
+            unread_count=F('unread_count') + delta
+        )
+        if not updated:
+            # First touch for this user: seed the counter from the messages table
+            cls.rebuild(user_id)
+    
+    @classmethod
+    def message_deleted(cls, sender, instance, **kwargs):
+        """post_delete handler for Message, including cascades from deleted users"""
+        # Recounted in one UPDATE: the deleted instance may predate a bulk
+        # mark-read, so its is_read cannot be trusted. Not seeded: the
+        # recipient may be the user being deleted, and a missing counter is
+        # rebuilt on its next read anyway.
+        unread = (
+            Message.objects.filter(recipient_id=OuterRef('user_id'), is_read=False)
+            .order_by().values('recipient_id').annotate(count=Count('id')).values('count')
+        )
+        cls.objects.filter(user_id=instance.recipient_id).update(
+            unread_count=Coalesce(Subquery(unread), 0)
+        )
+    
+    @classmethod
+    def rebuild(cls, user_id):
+        """Recount unread messages for a user and store the result"""
+        count = Message.objects.filter(recipient_id=user_id, is_read=False).count()
+        cls.objects.update_or_create(user_id=user_id, defaults={'unread_count': count})
+        return count
+
+
+class IdempotencyRecord(models.Model):
+    """Stored response for a client-supplied Idempotency-Key"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_records')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expiry_idx'),
+        ]
+
+
+class Job(models.Model):
+    """Deferred side effect, run at least once by a job worker"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Not before / lease expiry while running
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_due_idx'),
+        ]
+
+
+class DomainEvent(models.Model):
+    """Append-only outbox of domain changes, written in the changing transaction"""
+    id = models.BigAutoField(primary_key=True)  # Consumers read in id order
+    type = models.CharField(max_length=50)
+    user_id = models.BigIntegerField(null=True)  # Affected user; plain id so events outlive users
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['type', 'id'], name='domain_event_type_idx'),
+        ]
+    
+    @classmethod
+    def emit(cls, event_type, user_id=None, **payload):
+        """Append an event; call inside the transaction that made the change"""
+        return cls.objects.create(type=event_type, user_id=user_id, payload=payload)
+    
+    @classmethod
+    def visible(cls):
+        """
+        Events old enough that no earlier id can still be uncommitted.
+        
+        Ids are allocated at insert time but become visible at commit, so a
+        consumer that raced ahead could skip a slow transaction's event.
+        Holding back the newest OUTBOX_SAFETY_LAG seconds closes that window.
+        """
+        horizon = timezone.now() - timedelta(seconds=settings.OUTBOX_SAFETY_LAG)
+        return cls.objects.filter(created_at__lte=horizon)
+
+
+class EventCursor(models.Model):
+    """Last event id a named downstream consumer has processed"""
+    consumer = models.CharField(max_length=100, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @classmethod
+    def position_for(cls, consumer):
+        return cls.objects.filter(consumer=consumer).values_list('position', flat=True).first() or 0
+    
+    @classmethod
+    def advance(cls, consumer, position):
+        """Move the cursor forward; never backwards"""
+        cls.objects.get_or_create(consumer=consumer)
+        cls.objects.filter(consumer=consumer, position__lt=position).update(
+            position=position, updated_at=timezone.now()
+        )
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized text of a searchable row, kept current on write by
+    api/search.py and indexed by the database's full-text engine.
+    """
+    KIND_CHOICES = [
+        ('user', 'User'),
+        ('transaction', 'Transaction'),
+        ('message', 'Message'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_document_key'),
+        ]
+
+
+class RevokedToken(models.Model):
+    """
+    A JWT revoked by logout or refresh-token rotation, kept until the token
+    would have expired anyway (see api/revocation.py).
+    """
+    # First 8 bytes of sha256(jti): a fixed-size integer key instead of the jti string
+    jti_hash = models.BigIntegerField(primary_key=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='revoked_token_expiry_idx'),
+            models.Index(fields=['revoked_at'], name='revoked_token_recent_idx'),
+        ]
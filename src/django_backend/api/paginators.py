@@ -0,0 +1,53 @@
+"""
+Paginator for Django admin changelists on large tables.
+
+The stock Paginator runs an exact COUNT(*) over the whole (filtered) table
+on every page load, which takes seconds on tens of millions of rows. Here
+an unfiltered changelist takes its total from the database's table
+statistics (or the highest primary key before statistics exist), and a
+filtered one counts at most ADMIN_COUNT_LIMIT rows.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using='default'):
+    """Row count from planner statistics, or None when none are available"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # reltuples is -1 (or 0) until the table has been vacuumed/analyzed
+            return row[0] if row and row[0] > 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count never scans more than ADMIN_COUNT_LIMIT rows"""
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = queryset.query
+        if not query.where and not query.distinct:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is None:
+                # No statistics yet: the highest id is one index probe away
+                estimate = queryset.aggregate(highest=Max('pk'))['highest'] or 0
+            return estimate
+        limit = settings.ADMIN_COUNT_LIMIT
+        # COUNT over a LIMITed subquery stops reading after limit + 1 rows
+        counted = queryset.order_by()[:limit + 1].count()
+        return min(counted, limit)
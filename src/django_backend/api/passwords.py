@@ -0,0 +1,102 @@
+"""
+Password hashing off the request threads.
+
+A password hash is deliberately expensive CPU work. During signup bursts,
+hashing on the request threads leaves every worker busy at once. Here
+make_password runs in a pool of PASSWORD_HASH_WORKERS processes, so hashing
+uses every core however the web server is configured. At most two hashes
+per worker are queued. Further callers wait for a slot rather than
+building an unbounded backlog. hash_password_async lets the caller do its
+database reads while the hash is computed.
+
+With PASSWORD_HASH_WORKERS=0, passwords are hashed inline.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+QUEUED_PER_WORKER = 2
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(settings_module):
+    # Spawned workers start from a fresh interpreter
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.PASSWORD_HASH_WORKERS
+            # spawn rather than fork: the web process holds threads and open connections
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'investment_backend.settings'),),
+            )
+            _slots = threading.BoundedSemaphore(workers * QUEUED_PER_WORKER)
+        return _pool, _slots
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class PendingHash:
+    """A password being hashed in the pool"""
+    
+    def __init__(self, raw_password, future):
+        self.raw_password = raw_password
+        self.future = future
+    
+    def result(self):
+        try:
+            return self.future.result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM killed); hash here and start a new pool next time
+            _discard_pool()
+            return make_password(self.raw_password)
+    
+    def cancel(self):
+        self.future.cancel()
+
+
+def hash_password_async(raw_password):
+    """Start make_password(raw_password) in the pool, so the caller can do I/O meanwhile"""
+    future = Future()
+    if not settings.PASSWORD_HASH_WORKERS:
+        future.set_result(make_password(raw_password))
+        return PendingHash(raw_password, future)
+    
+    pool, slots = _get_pool()
+    slots.acquire()
+    try:
+        future = pool.submit(make_password, raw_password)
+    except (BrokenProcessPool, RuntimeError):
+        slots.release()
+        _discard_pool()
+        future.set_result(make_password(raw_password))
+        return PendingHash(raw_password, future)
+    future.add_done_callback(lambda _: slots.release())
+    return PendingHash(raw_password, future)
+
+
+def hash_password(raw_password):
+    """make_password(raw_password), computed in the hashing pool"""
+    return hash_password_async(raw_password).result()
@@ -0,0 +1,191 @@
+"""
+Payout schedule projections for many investments at once.
+
+An active investment pays its daily_return once per day from the day after
+start_date up to and including end_date, and its principal matures on
+end_date. Rather than walking each investment day by day, every investment
+(or group of investments sharing a start and end date) adds its daily return
+to a difference array at the first payout day inside the window and removes
+it after the last; a running sum then gives the platform's payout for every
+day. The cost is O(investments + days) whatever the durations are.
+
+Amounts are carried as integer cents so the NumPy path (used when NumPy is
+installed) and the pure-Python path give identical results.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Transaction, User, UserInvestment
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+DEFAULT_DAYS = 90
+MAX_DAYS = 1825
+
+
+def to_cents(amount):
+    return int((Decimal(amount or 0) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    return float(Decimal(int(cents)) / 100)
+
+
+def grouped_rows(queryset):
+    """(daily_return, start_date, end_date, principal) summed per start/end date pair"""
+    groups = (
+        queryset.order_by()
+        .values('end_date', 'start_date')
+        .annotate(daily=Sum('daily_return'), principal=Sum('amount'))
+    )
+    return [(g['daily'], g['start_date'], g['end_date'], g['principal']) for g in groups]
+
+
+def _schedule_numpy(rows, first_day, days):
+    daily = np.array([to_cents(row[0]) for row in rows], dtype=np.int64)
+    starts = np.array([row[1].toordinal() for row in rows], dtype=np.int64) - first_day
+    ends = np.array([row[2].toordinal() for row in rows], dtype=np.int64) - first_day
+    principal = np.array([to_cents(row[3]) for row in rows], dtype=np.int64)
+    
+    first = np.maximum(starts + 1, 0)
+    last = np.minimum(ends, days - 1)
+    paying = first <= last
+    diff = np.zeros(days + 1, dtype=np.int64)
+    np.add.at(diff, first[paying], daily[paying])
+    np.add.at(diff, last[paying] + 1, -daily[paying])
+    
+    maturing = np.zeros(days, dtype=np.int64)
+    in_window = (ends >= 0) & (ends < days)
+    np.add.at(maturing, ends[in_window], principal[in_window])
+    return np.cumsum(diff[:days]).tolist(), maturing.tolist()
+
+
+def _schedule_python(rows, first_day, days):
+    diff = [0] * (days + 1)
+    maturing = [0] * days
+    for daily, start_date, end_date, principal in rows:
+        start = start_date.toordinal() - first_day
+        end = end_date.toordinal() - first_day
+        first, last = max(start + 1, 0), min(end, days - 1)
+        if first <= last:
+            cents = to_cents(daily)
+            diff[first] += cents
+            diff[last + 1] -= cents
+        if 0 <= end < days:
+            maturing[end] += to_cents(principal)
+    return list(accumulate(diff[:days])), maturing
+
+
+def payout_schedule(rows, start=None, days=DEFAULT_DAYS, use_numpy=None):
+    """
+    Per-date payout and maturing principal totals for days starting at start.
+    
+    rows are (daily_return, start_date, end_date, principal) tuples, either one
+    per investment or pre-summed per start/end date by grouped_rows().
+    """
+    start = start or date.today()
+    rows = list(rows)
+    if use_numpy is None:
+        use_numpy = np is not None
+    if not rows:
+        payouts, maturing = [0] * days, [0] * days
+    elif use_numpy:
+        payouts, maturing = _schedule_numpy(rows, start.toordinal(), days)
+    else:
+        payouts, maturing = _schedule_python(rows, start.toordinal(), days)
+    
+    schedule = []
+    for offset, (payout, cumulative, principal) in enumerate(zip(payouts, accumulate(payouts), maturing)):
+        schedule.append({
+            'date': (start + timedelta(days=offset)).isoformat(),
+            'payout': from_cents(payout),
+            'cumulative_payout': from_cents(cumulative),
+            'maturing_principal': from_cents(principal),
+        })
+    return {
+        'start': start.isoformat(),
+        'days': days,
+        'total_payout': from_cents(sum(payouts)),
+        'total_maturing_principal': from_cents(sum(maturing)),
+        'schedule': schedule,
+    }
+
+
+def investment_summary(investment, today=None):
+    """Paid and remaining returns of one investment as closed-form arithmetic series"""
+    today = today or date.today()
+    duration = (investment.end_date - investment.start_date).days
+    paid_days = min(max((today - investment.start_date).days, 0), duration)
+    remaining_days = duration - paid_days
+    return {
+        'id': investment.id,
+        'pack': investment.pack.name,
+        'amount': float(investment.amount),
+        'daily_return': float(investment.daily_return),
+        'start_date': investment.start_date.isoformat(),
+        'maturity_date': investment.end_date.isoformat(),
+        'payouts_made': paid_days,
+        'payouts_remaining': remaining_days,
+        'returned_to_date': float(investment.daily_return * paid_days),
+        'remaining_return': float(investment.daily_return * remaining_days),
+        'next_payout': (
+            max(today, investment.start_date) + timedelta(days=1)
+        ).isoformat() if remaining_days else None,
+    }
+
+
+def liability_cache_key(days=DEFAULT_DAYS, today=None):
+    return f'liability-report:{(today or date.today()).isoformat()}:{days}'
+
+
+def liability_report(days=DEFAULT_DAYS):
+    """
+    Everything the platform currently owes its customers, plus the daily
+    payouts due over the next days, cached for LIABILITY_REPORT_TTL seconds.
+    
+    Investments are summed per start/end date in SQL, and pending withdrawals
+    and balances come from one indexed aggregate each, so the cost barely
+    grows with the number of investments.
+    """
+    today = date.today()
+    cache_key = liability_cache_key(days, today)
+    report = cache.get(cache_key)
+    if report is not None:
+        return report
+    
+    rows = grouped_rows(UserInvestment.objects.filter(status='active', end_date__gt=today))
+    remaining_returns = sum(
+        to_cents(daily) * (end_date - max(start_date, today)).days
+        for daily, start_date, end_date, _ in rows
+    )
+    principal = sum(to_cents(row[3]) for row in rows)
+    # Read from the transactions themselves (transaction_type_status_idx):
+    # pending withdrawals are few, and a liability figure must not drift
+    # with counters that user deletion does not reach
+    pending = Transaction.objects.filter(
+        type='withdrawal', status='pending'
+    ).aggregate(count=Count('id'), amount=Sum('amount'))
+    pending_withdrawals = to_cents(pending['amount'])
+    balances = to_cents(User.objects.filter(role='customer').aggregate(total=Sum('balance'))['total'])
+    
+    report = {
+        'generated_at': timezone.now().isoformat(),
+        'customer_balances': from_cents(balances),
+        'pending_withdrawals': from_cents(pending_withdrawals),
+        'pending_withdrawal_count': pending['count'] or 0,
+        'remaining_returns': from_cents(remaining_returns),
+        'active_principal': from_cents(principal),
+        'total_obligations': from_cents(balances + pending_withdrawals + remaining_returns + principal),
+        'projection': payout_schedule(rows, start=today + timedelta(days=1), days=days),
+    }
+    cache.set(cache_key, report, settings.LIABILITY_REPORT_TTL)
+    return report
@@ -0,0 +1,196 @@
+"""
+Revocation of JWTs on logout and refresh-token rotation.
+
+A revoked token is stored as a RevokedToken row: an 8-byte hash of its jti
+and the time the token expires. Past that time the token is rejected on its
+own, so purge_revoked_tokens deletes the row and the table only ever holds
+tokens that are still live.
+
+Every authenticated request checks its access token, so lookups go through
+a per-process bloom filter of the revoked hashes first. A token that is
+not in the filter (almost every token) is accepted without a query. Only
+filter hits (revoked tokens, plus about FILTER_ERROR_RATE of the others)
+are confirmed with a primary key lookup.
+
+Each revocation bumps a generation number in the shared cache once it
+commits. A process that sees a new generation adds the rows revoked since
+its last sync to its filter, so a logout takes effect on every worker on
+their next request. REVOCATION_FILTER_REFRESH bounds how stale a filter can
+get when the cache is per-process; set REDIS_URL when running several
+workers.
+
+Refreshing with rotation enabled revokes the presented refresh token by
+inserting its row, so a refresh token works exactly once, even when the
+same token is presented concurrently.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import authentication, serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+FILTER_ERROR_RATE = 0.001
+GENERATION_KEY = 'revocation-generation'
+# Rows are synced by revoked_at; the overlap covers clock skew between
+# servers and revocations committed shortly after their timestamp
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def jti_hash(jti):
+    """The signed 64-bit integer RevokedToken stores for a jti"""
+    digest = hashlib.sha256(str(jti).encode()).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+class BloomFilter:
+    """Set of 64-bit hashes with false positives but no false negatives"""
+    
+    def __init__(self, capacity, error_rate=FILTER_ERROR_RATE):
+        self.capacity = max(capacity, 1024)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, value):
+        # value is already a uniform hash: derive the k bit positions from
+        # its two halves (double hashing) instead of hashing again
+        value &= 0xFFFFFFFFFFFFFFFF
+        first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+    
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+    
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+
+_lock = threading.Lock()
+_filter = None
+_generation = None
+_checked_at = 0.0   # time.monotonic() of the last sync
+_synced_until = None   # revoked_at up to which rows are in the filter
+
+
+def _load(since=None):
+    """Add rows revoked since `since` (all live rows when None) to the filter"""
+    global _filter, _synced_until
+    started = timezone.now()
+    rows = RevokedToken.objects.filter(expires_at__gt=started)
+    if since is None:
+        _filter = BloomFilter(2 * rows.count())
+    else:
+        rows = rows.filter(revoked_at__gte=since - SYNC_OVERLAP)
+    for digest in rows.values_list('jti_hash', flat=True).iterator(chunk_size=10000):
+        _filter.add(digest)
+    _synced_until = started
+
+
+def _stale(generation):
+    return (
+        _filter is None
+        or generation != _generation
+        or time.monotonic() - _checked_at >= settings.REVOCATION_FILTER_REFRESH
+    )
+
+
+def _current_filter():
+    global _generation, _checked_at
+    generation = cache.get(GENERATION_KEY)
+    if not _stale(generation):
+        return _filter
+    
+    with _lock:
+        if _stale(generation):
+            # Rebuild once the filter outgrows its error rate; expired
+            # entries are dropped at the same time
+            _load(None if _filter is None or _filter.full else _synced_until)
+            _generation = generation
+            _checked_at = time.monotonic()
+        return _filter
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Not cached: any new value differs from what workers last saw
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def is_revoked(jti):
+    digest = jti_hash(jti)
+    if digest not in _current_filter():
+        return False
+    return RevokedToken.objects.filter(jti_hash=digest).exists()
+
+
+def revoke(token):
+    """Revoke a validated token until it expires; False if it already was"""
+    digest = jti_hash(token[api_settings.JTI_CLAIM])
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(jti_hash=digest, expires_at=datetime_from_epoch(token['exp']))
+    except IntegrityError:
+        return False
+    
+    with _lock:
+        if _filter is not None:
+            _filter.add(digest)
+    transaction.on_commit(_bump_generation)
+    return True
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """simplejwt authentication that also rejects revoked access tokens"""
+    
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken(_('Token has been revoked'))
+        return token
+
+
+class OptionalJWTAuthentication(JWTAuthentication):
+    """Treats an expired, revoked or otherwise invalid access token as no credentials"""
+    
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return None
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    """Token refresh that rejects revoked refresh tokens and revokes rotated ones"""
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            # Claiming the token with an insert also stops two concurrent
+            # refreshes from both succeeding
+            if not revoke(refresh):
+                raise InvalidToken(_('Token has been revoked'))
+        elif is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise InvalidToken(_('Token has been revoked'))
+        return super().validate(attrs)
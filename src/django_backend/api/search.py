@@ -0,0 +1,200 @@
+"""
+Full-text search over users, transactions and messages.
+
+Each searchable row has a SearchDocument holding its text, refreshed by
+post_save/post_delete signals inside the writing transaction. The documents
+are indexed by the database itself:
+
+  SQLite   - an external-content FTS5 table with the trigram tokenizer, kept
+             in sync by triggers, so partial emails, wallet addresses and
+             hashes match as well as words; ranked by bm25
+  Postgres - GIN indexes on a 'simple' tsvector and on pg_trgm trigrams,
+             ranked by ts_rank plus trigram similarity
+
+Other databases fall back to a case-insensitive substring scan. The
+database objects are created by migration 0003_search_index; run
+rebuild_search_index to backfill documents for existing rows.
+"""
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Message, SearchDocument, Transaction, User
+
+MIN_TERM_LENGTH = 3  # Shortest term a trigram index can match
+SNIPPET_LENGTH = 200
+
+_substring_aliases = {}  # SQLite alias -> whether its FTS table uses trigrams
+
+
+def user_document(user):
+    body = [user.email, user.referral_code, user.first_name, user.last_name]
+    return user.username, ' '.join(part for part in body if part)
+
+
+def transaction_document(txn):
+    title = f'{txn.get_type_display()} #{txn.pk}'
+    body = [txn.wallet_address, txn.transaction_hash, txn.admin_note]
+    return title, ' '.join(part for part in body if part)
+
+
+def message_document(message):
+    body = [message.message, message.submitted_link]
+    return message.subject, ' '.join(part for part in body if part)
+
+
+# model -> (document kind, text builder, fields the text is built from)
+INDEXED_MODELS = {
+    User: ('user', user_document, {'username', 'email', 'referral_code', 'first_name', 'last_name'}),
+    Transaction: ('transaction', transaction_document, {'type', 'wallet_address', 'transaction_hash', 'admin_note'}),
+    Message: ('message', message_document, {'subject', 'message', 'submitted_link'}),
+}
+
+
+# ==== Index maintenance ====
+
+def index_document(kind, object_id, title, body):
+    """Insert or refresh one document; a no-op when the text is unchanged"""
+    title = title[:255]
+    documents = SearchDocument.objects.filter(kind=kind, object_id=object_id)
+    if documents.exclude(title=title, body=body).update(title=title, body=body, updated_at=timezone.now()):
+        return
+    if documents.exists():
+        return
+    try:
+        with transaction.atomic():
+            SearchDocument.objects.create(kind=kind, object_id=object_id, title=title, body=body)
+    except IntegrityError:
+        pass  # Indexed concurrently
+
+
+def index_instance(instance):
+    kind, build, _ = INDEXED_MODELS[type(instance)]
+    index_document(kind, instance.pk, *build(instance))
+
+
+def _on_save(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    kind, build, fields = INDEXED_MODELS[sender]
+    if created:
+        # A new row has no document yet: one INSERT instead of UPDATE + SELECT + INSERT
+        title, body = build(instance)
+        try:
+            with transaction.atomic():
+                SearchDocument.objects.create(kind=kind, object_id=instance.pk, title=title[:255], body=body)
+            return
+        except IntegrityError:
+            pass  # Left behind by a deleted row with a reused id
+    elif update_fields is not None and not fields.intersection(update_fields):
+        return
+    index_instance(instance)
+
+
+def _on_delete(sender, instance, **kwargs):
+    kind = INDEXED_MODELS[sender][0]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def connect_signals():
+    for model in INDEXED_MODELS:
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'search-save-{model.__name__}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'search-delete-{model.__name__}')
+
+
+# ==== Database objects ====
+
+def _fts_table():
+    return f'{SearchDocument._meta.db_table}_fts'
+
+
+def _substring_search(using):
+    """Whether the alias's FTS table was built with the trigram tokenizer"""
+    if using not in _substring_aliases:
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [_fts_table()])
+            row = cursor.fetchone()
+        _substring_aliases[using] = row is not None and 'trigram' in row[0]
+    return _substring_aliases[using]
+
+
+# ==== Queries ====
+
+def search_terms(text):
+    """Split a query into terms the index can match"""
+    terms = [term for term in text.split() if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        raise ValueError(f'Search terms must be at least {MIN_TERM_LENGTH} characters')
+    return terms
+
+
+def _sqlite_search(cursor, text, kinds, limit, offset, substring):
+    table, fts = SearchDocument._meta.db_table, _fts_table()
+    # Trigram terms match anywhere in a word; plain tokens fall back to prefixes
+    suffix = '' if substring else '*'
+    match = ' '.join('"{}"{}'.format(term.replace('"', '""'), suffix) for term in search_terms(text))
+    kind_filter = f"AND d.kind IN ({', '.join(['%s'] * len(kinds))})" if kinds else ''
+    cursor.execute(
+        f"SELECT d.kind, d.object_id, d.title, "
+        f"snippet({fts}, -1, '[', ']', '...', 16), -bm25({fts}) AS score "
+        f"FROM {fts} JOIN {table} d ON d.id = {fts}.rowid "
+        f"WHERE {fts} MATCH %s {kind_filter} "
+        f"ORDER BY bm25({fts}) LIMIT %s OFFSET %s",
+        [match, *kinds, limit, offset]
+    )
+    return cursor.fetchall()
+
+
+def _postgres_search(cursor, text, kinds, limit, offset):
+    table = SearchDocument._meta.db_table
+    search_terms(text)
+    document = "(title || ' ' || body)"
+    pattern = '%{}%'.format(text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+    kind_filter = 'AND kind = ANY(%s)' if kinds else ''
+    cursor.execute(
+        f"SELECT kind, object_id, title, left(body, {SNIPPET_LENGTH}), "
+        f"ts_rank(to_tsvector('simple', {document}), plainto_tsquery('simple', %s)) "
+        f"+ similarity({document}, %s) AS score "
+        f"FROM {table} "
+        f"WHERE (to_tsvector('simple', {document}) @@ plainto_tsquery('simple', %s) "
+        f"OR {document} ILIKE %s) {kind_filter} "
+        f"ORDER BY score DESC, id DESC LIMIT %s OFFSET %s",
+        [text, text, text, pattern, *([list(kinds)] if kinds else []), limit, offset]
+    )
+    return cursor.fetchall()
+
+
+def _fallback_search(text, kinds, limit, offset):
+    search_terms(text)
+    documents = SearchDocument.objects.all()
+    for term in text.split():
+        documents = documents.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    rows = documents.order_by('-updated_at')[offset:offset + limit]
+    return [(d.kind, d.object_id, d.title, d.body[:SNIPPET_LENGTH], 0.0) for d in rows]
+
+
+def search(text, kinds=None, limit=20, offset=0, using='default'):
+    """Ranked matches as dicts of kind, object_id, title, snippet and score"""
+    kinds = list(kinds or [])
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        substring = _substring_search(using)
+        with connection.cursor() as cursor:
+            rows = _sqlite_search(cursor, text, kinds, limit, offset, substring)
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            rows = _postgres_search(cursor, text, kinds, limit, offset)
+    else:
+        rows = _fallback_search(text, kinds, limit, offset)
+    return [
+        {'kind': kind, 'object_id': object_id, 'title': title, 'snippet': snippet, 'score': score}
+        for kind, object_id, title, snippet, score in rows
+    ]
+
+
+def search_ids(kind, text, limit=1000):
+    """Ids of the best matching rows of one kind, for narrowing a queryset"""
+    return [hit['object_id'] for hit in search(text, kinds=[kind], limit=limit)]
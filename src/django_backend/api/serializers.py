@@ -1,9 +1,15 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import models, transaction
 from .models import (
     InvestmentPack, UserInvestment, Transaction,
-    ReferralPack, ReferralCommission, KYCVerification, Message
+    ReferralPack, ReferralCommission, KYCVerification, Message,
+    ArchivedTransaction, ArchivedMessage, DomainEvent
 )
+from .passwords import hash_password_async
+from .storage import signed_media_url
+from .uploads import ContentAddressedFile
 
 User = get_user_model()
 
@@ -39,19 +45,25 @@ class SignupSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         referral_code = validated_data.pop('referral_code', None)
+        # Hashed in the worker pool while the referrer is looked up
+        password = hash_password_async(validated_data.pop('password'))
         
-        # Find referrer if code provided
+        # Find referrer if code provided, reading only what the new user's referral path needs
         referred_by = None
         if referral_code:
-            try:
-                referred_by = User.objects.get(referral_code=referral_code)
-            except User.DoesNotExist:
+            referred_by = User.objects.only('id', 'referral_path', 'referral_depth').filter(
+                referral_code=referral_code
+            ).first()
+            if referred_by is None:
+                password.cancel()
                 raise serializers.ValidationError("Invalid referral code")
         
-        user = User.objects.create_user(
-            **validated_data,
-            referred_by=referred_by
-        )
+        # What create_user does, minus hashing on this thread; User.save inserts
+        # the user and updates the upline counters in a single transaction
+        user = User(**validated_data, referred_by=referred_by, password=password.result())
+        user.username = User.normalize_username(user.username)
+        user.email = User.objects.normalize_email(user.email)
+        user.save()
         return user
 
 
@@ -79,6 +91,12 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'status', 'transaction_hash', 'created_at', 'updated_at']
 
 
+class ArchivedTransactionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedTransaction
+        exclude = ['archived_at']
+
+
 class ReferralPackSerializer(serializers.ModelSerializer):
     class Meta:
         model = ReferralPack
@@ -93,11 +111,81 @@ class ReferralSerializer(serializers.ModelSerializer):
         fields = ['id', 'referred_user', 'amount', 'created_at']
 
 
+class SignedMediaField(serializers.ImageField):
+    """Image field rendered as a short-lived signed link instead of a storage URL"""
+    
+    def to_representation(self, value):
+        if not value:
+            return None
+        return signed_media_url(value.name, self.context.get('request'))
+
+
+class DownlineUserSerializer(serializers.ModelSerializer):
+    level = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'level', 'downline_count', 'created_at']
+    
+    def get_level(self, obj):
+        # Depth relative to the user whose downline is listed
+        return obj.referral_depth - self.context['root_depth']
+
+
 class KYCVerificationSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: SignedMediaField,
+    }
+    
     class Meta:
         model = KYCVerification
         fields = '__all__'
-        read_only_fields = ['user', 'status', 'admin_note', 'reviewed_at']
+        read_only_fields = [
+            'user', 'status', 'admin_note', 'reviewed_at', 'image_status',
+            'id_front_thumbnail', 'id_back_thumbnail', 'selfie_thumbnail'
+        ]
+    
+    def _validate_upload_size(self, image):
+        if image and image.size > settings.KYC_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f'Image must be smaller than {settings.KYC_MAX_UPLOAD_SIZE // (1024 * 1024)} MB'
+            )
+        return image
+    
+    def validate_id_front_image(self, image):
+        return self._validate_upload_size(image)
+    
+    def validate_id_back_image(self, image):
+        return self._validate_upload_size(image)
+    
+    def validate_selfie_image(self, image):
+        return self._validate_upload_size(image)
+    
+    def create(self, validated_data):
+        uploads = []
+        for field in ('id_front_image', 'id_back_image', 'selfie_image'):
+            upload = validated_data.get(field)
+            if isinstance(upload, ContentAddressedFile):
+                # Record the content-addressed name; the file is stored below
+                validated_data[field] = upload.storage_name
+                uploads.append(upload)
+        kyc = super().create(validated_data)
+        for upload in uploads:
+            # Stored only once the row referencing it is visible, so a failed
+            # submission leaves nothing behind and processing of an earlier
+            # identical one cannot delete the shared copy from under it
+            transaction.on_commit(upload.store)
+        return kyc
+
+
+class KYCAdminListSerializer(serializers.ModelSerializer):
+    """KYC review list: thumbnails only, full-size images via the detail endpoint"""
+    serializer_field_mapping = KYCVerificationSerializer.serializer_field_mapping
+    
+    class Meta:
+        model = KYCVerification
+        exclude = ['id_front_image', 'id_back_image', 'selfie_image']
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -109,3 +197,18 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = '__all__'
         read_only_fields = ['sender', 'created_at']
+
+
+class ArchivedMessageSerializer(serializers.ModelSerializer):
+    sender = UserSerializer(read_only=True)
+    recipient = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = ArchivedMessage
+        exclude = ['archived_at']
+
+
+class DomainEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DomainEvent
+        fields = ['id', 'type', 'user_id', 'payload', 'created_at']
@@ -0,0 +1,205 @@
+"""
+Storage backends for KYC documents.
+
+KYC_STORAGE_BACKEND selects where document images live: 'local' keeps them
+under MEDIA_ROOT, 's3' talks to any S3-compatible endpoint (AWS, MinIO or a
+local stand-in) using SigV4-signed requests. Clients never receive storage
+paths directly; they get short-lived signed links that kyc_media_view hands
+off to the web server or to a presigned object URL.
+"""
+import functools
+import hashlib
+import hmac
+import mimetypes
+import tempfile
+from datetime import datetime, timezone
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.urls import reverse
+
+MEDIA_SIGNING_SALT = 'api.kyc-media'
+
+
+@functools.lru_cache(maxsize=None)
+def _kyc_storage():
+    if settings.KYC_STORAGE_BACKEND == 's3':
+        return S3Storage(
+            endpoint_url=settings.KYC_S3_ENDPOINT_URL,
+            bucket=settings.KYC_S3_BUCKET,
+            region=settings.KYC_S3_REGION,
+            access_key=settings.KYC_S3_ACCESS_KEY_ID,
+            secret_key=settings.KYC_S3_SECRET_ACCESS_KEY,
+            url_ttl=settings.KYC_MEDIA_URL_TTL,
+        )
+    return FileSystemStorage()
+
+
+def kyc_storage():
+    """Return the configured storage for KYC images"""
+    # A plain function, unlike the cached one, can be referenced from migrations
+    return _kyc_storage()
+
+
+def signed_media_url(name, request=None):
+    """Build a short-lived link to a stored KYC image"""
+    token = signing.TimestampSigner(salt=MEDIA_SIGNING_SALT).sign_object(name)
+    url = reverse('kyc_media', args=[token])
+    return request.build_absolute_uri(url) if request else url
+
+
+def unsign_media_token(token):
+    """Return the storage name for a media token, or None if invalid or expired"""
+    try:
+        return signing.TimestampSigner(salt=MEDIA_SIGNING_SALT).unsign_object(
+            token, max_age=settings.KYC_MEDIA_URL_TTL
+        )
+    except signing.BadSignature:
+        return None
+
+
+def guess_content_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class S3Error(OSError):
+    pass
+
+
+class S3Storage(Storage):
+    """Minimal S3-compatible storage using path-style addressing"""
+    
+    def __init__(self, endpoint_url, bucket, region, access_key, secret_key, url_ttl=300):
+        parsed = urlsplit(endpoint_url)
+        self.secure = parsed.scheme == 'https'
+        self.host = parsed.netloc
+        self.base_path = parsed.path.rstrip('/')
+        self.bucket = bucket
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.url_ttl = url_ttl
+    
+    # ---- SigV4 ----
+    
+    def _object_path(self, name):
+        return f'{self.base_path}/{self.bucket}/{quote(name, safe="/~")}'
+    
+    def _signing_key(self, datestamp):
+        key = ('AWS4' + self.secret_key).encode()
+        for part in (datestamp, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+    
+    def _signature(self, now, canonical_request):
+        datestamp = now.strftime('%Y%m%d')
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256',
+            now.strftime('%Y%m%dT%H%M%SZ'),
+            f'{datestamp}/{self.region}/s3/aws4_request',
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        return hmac.new(self._signing_key(datestamp), string_to_sign.encode(), hashlib.sha256).hexdigest()
+    
+    def _request(self, method, name, body=None, headers=None):
+        now = datetime.now(timezone.utc)
+        path = self._object_path(name)
+        headers = {
+            'host': self.host,
+            'x-amz-date': now.strftime('%Y%m%dT%H%M%SZ'),
+            'x-amz-content-sha256': 'UNSIGNED-PAYLOAD',
+            **(headers or {}),
+        }
+        ordered = sorted((key.lower(), str(value).strip()) for key, value in headers.items())
+        signed_headers = ';'.join(key for key, _ in ordered)
+        canonical_request = '\n'.join([
+            method,
+            path,
+            '',
+            ''.join(f'{key}:{value}\n' for key, value in ordered),
+            signed_headers,
+            'UNSIGNED-PAYLOAD',
+        ])
+        scope = f'{now.strftime("%Y%m%d")}/{self.region}/s3/aws4_request'
+        headers['Authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+            f'SignedHeaders={signed_headers}, Signature={self._signature(now, canonical_request)}'
+        )
+        
+        connection_class = HTTPSConnection if self.secure else HTTPConnection
+        connection = connection_class(self.host, timeout=30)
+        connection.request(method, path, body=body, headers=headers)
+        return connection, connection.getresponse()
+    
+    def _call(self, method, name, expected=(200,), **kwargs):
+        connection, response = self._request(method, name, **kwargs)
+        try:
+            if response.status not in expected:
+                raise S3Error(f'S3 {method} {name} failed with HTTP {response.status}')
+            response.read()
+            return response
+        finally:
+            connection.close()
+    
+    # ---- Storage API ----
+    
+    def _open(self, name, mode='rb'):
+        connection, response = self._request('GET', name)
+        try:
+            if response.status != 200:
+                raise S3Error(f'S3 GET {name} failed with HTTP {response.status}')
+            spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+            while chunk := response.read(64 * 1024):
+                spool.write(chunk)
+        finally:
+            connection.close()
+        spool.seek(0)
+        return File(spool, name=name)
+    
+    def _save(self, name, content):
+        content.seek(0)
+        self._call('PUT', name, body=content, headers={
+            'Content-Length': str(content.size),
+            'Content-Type': guess_content_type(name),
+        })
+        return name
+    
+    def exists(self, name):
+        connection, response = self._request('HEAD', name)
+        connection.close()
+        if response.status == 404:
+            return False
+        if response.status != 200:
+            raise S3Error(f'S3 HEAD {name} failed with HTTP {response.status}')
+        return True
+    
+    def delete(self, name):
+        self._call('DELETE', name, expected=(200, 204, 404))
+    
+    def size(self, name):
+        return int(self._call('HEAD', name).getheader('Content-Length'))
+    
+    def url(self, name):
+        """Presigned GET valid for url_ttl seconds"""
+        now = datetime.now(timezone.utc)
+        path = self._object_path(name)
+        query = {
+            'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+            'X-Amz-Credential': f'{self.access_key}/{now.strftime("%Y%m%d")}/{self.region}/s3/aws4_request',
+            'X-Amz-Date': now.strftime('%Y%m%dT%H%M%SZ'),
+            'X-Amz-Expires': str(self.url_ttl),
+            'X-Amz-SignedHeaders': 'host',
+        }
+        canonical_query = '&'.join(
+            f'{quote(key, safe="-_.~")}={quote(value, safe="-_.~")}' for key, value in sorted(query.items())
+        )
+        canonical_request = '\n'.join([
+            'GET', path, canonical_query, f'host:{self.host}\n', 'host', 'UNSIGNED-PAYLOAD'
+        ])
+        scheme = 'https' if self.secure else 'http'
+        signature = self._signature(now, canonical_request)
+        return f'{scheme}://{self.host}{path}?{canonical_query}&X-Amz-Signature={signature}'
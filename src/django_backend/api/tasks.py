@@ -0,0 +1,73 @@
+"""
+Job handlers. Each one may run more than once for the same payload (see
+api/jobs.py), so each checks for its own previous effects first.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+
+from .jobs import job
+from .kyc_images import process_kyc_images
+from .milestones import record_referral
+from .models import (
+    AffiliateStats, DomainEvent, ReferralCommission, Transaction, User, UserInvestment, money
+)
+
+REFERRAL_COMMISSION_RATE = Decimal('0.03')  # 3% commission
+
+
+@job('referral_commission')
+def pay_referral_commission(investment_id):
+    """Credit the referrer of an investment's owner, once per investment"""
+    with transaction.atomic():
+        investment = (
+            UserInvestment.objects.select_for_update()
+            .select_related('user')
+            .filter(id=investment_id)
+            .first()
+        )
+        if investment is None or not investment.user.referred_by_id:
+            return
+        if ReferralCommission.objects.filter(investment=investment).exists():
+            return
+        
+        referrer_id = investment.user.referred_by_id
+        commission_amount = money(investment.amount * REFERRAL_COMMISSION_RATE)
+        User.objects.filter(id=referrer_id).update(balance=F('balance') + commission_amount)
+        DomainEvent.emit('balance.changed', referrer_id, delta=commission_amount)
+        
+        ReferralCommission.objects.create(
+            referrer_id=referrer_id,
+            referred_user=investment.user,
+            amount=commission_amount,
+            investment=investment
+        )
+        AffiliateStats.record_commission(referrer_id, commission_amount)
+        
+        Transaction.objects.create(
+            user_id=referrer_id,
+            type='referral_commission',
+            amount=commission_amount,
+            status='completed'
+        )
+        
+        # The stats row stays locked by record_commission's update until commit
+        referral_count = AffiliateStats.objects.values_list('referral_count', flat=True).get(user_id=referrer_id)
+        record_referral(referrer_id, referral_count)
+
+
+@job('process_kyc_images', max_attempts=3)
+def run_kyc_image_processing(kyc_id):
+    """Normalize a submission's images; a repeat finds it no longer pending"""
+    process_kyc_images(kyc_id)
+
+
+@job('notify_user')
+def notify_user(user_id, subject, message):
+    """Email a user; a retry after a lost acknowledgement may send it twice"""
+    email = User.objects.filter(id=user_id).values_list('email', flat=True).first()
+    if email:
+        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
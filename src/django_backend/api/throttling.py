@@ -0,0 +1,129 @@
+"""
+Token-bucket throttling for abuse-prone endpoints.
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] in DRF's
+"<requests>/<period>" form: the number is the bucket capacity (burst) and
+the bucket refills at requests/period. Buckets are kept as a single
+theoretical-arrival-time float per key (GCRA), which behaves exactly like a
+token bucket but needs one read and one write per check.
+
+THROTTLE_STORE picks where buckets live: 'local' keeps them in process
+memory (tests, single worker), 'cache' uses the default Django cache so all
+workers share them when REDIS_URL is configured.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (capacity 10, emission interval 6.0 seconds)"""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, PERIODS[period[0]] / capacity
+
+
+class LocalBucketStore:
+    """Per-process buckets, bounded to the most recently seen keys"""
+    
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def consume(self, key, interval, burst, now):
+        with self._lock:
+            tat = max(self._buckets.get(key, now), now)
+            wait = tat - now - burst
+            if wait > 0:
+                return wait
+            self._buckets[key] = tat + interval
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0.0
+    
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """Buckets in the shared Django cache.
+    
+    The read and write are not atomic, so racing requests from one client
+    can occasionally both pass; the limit holds to within the worker count.
+    """
+    
+    def consume(self, key, interval, burst, now):
+        cache_key = f'throttle:{key}'
+        tat = max(cache.get(cache_key, now), now)
+        wait = tat - now - burst
+        if wait > 0:
+            return wait
+        cache.set(cache_key, tat + interval, timeout=int(burst + interval) + 1)
+        return 0.0
+    
+    def clear(self):
+        pass
+
+
+_stores = {'local': LocalBucketStore(), 'cache': CacheBucketStore()}
+
+
+def get_store():
+    return _stores[settings.THROTTLE_STORE]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle keyed by user id when authenticated, client IP otherwise"""
+    scope = None
+    key_by_ip = False
+    
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if rate is None:
+            return True
+        capacity, interval = parse_rate(rate)
+        
+        if request.user and request.user.is_authenticated and not self.key_by_ip:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        
+        self.wait_seconds = get_store().consume(
+            f'{self.scope}:{ident}', interval, (capacity - 1) * interval, time.time()
+        )
+        return self.wait_seconds == 0
+    
+    def wait(self):
+        return self.wait_seconds
+
+
+class SignupThrottle(TokenBucketThrottle):
+    scope = 'signup'
+    key_by_ip = True
+
+
+class LoginThrottle(TokenBucketThrottle):
+    scope = 'login'
+    key_by_ip = True
+
+
+class DepositThrottle(TokenBucketThrottle):
+    scope = 'deposit'
+
+
+class WithdrawalThrottle(TokenBucketThrottle):
+    scope = 'withdrawal'
+
+
+class SendMessageThrottle(TokenBucketThrottle):
+    scope = 'send_message'
@@ -0,0 +1,156 @@
+"""
+Streaming upload handling for KYC documents.
+
+File parts are written chunk by chunk to a staging file under MEDIA_ROOT
+while a SHA-256 digest is computed. Nothing reaches KYC storage while the
+request is parsed: the serializer stores a file under its content-addressed
+name only once the submission is valid and its row has committed, and the
+staging file of anything else is deleted when the request closes its
+uploads. The stored extension comes from the image format Pillow detects,
+never from the client's filename. Identical files share one stored copy,
+which process_kyc_images deletes once no submission still references it
+(see api/kyc_images.py). Bodies larger than KYC_MAX_REQUEST_SIZE are
+refused before any of the body is read, and a single file over
+KYC_MAX_UPLOAD_SIZE stops the upload mid-stream.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.temp import NamedTemporaryFile
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+
+from .storage import kyc_storage
+
+CAS_DIRECTORY = 'kyc/cas'
+
+# Stored extension by the format Pillow detects
+IMAGE_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'MPO': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'GIF': '.gif',
+    'BMP': '.bmp',
+    'TIFF': '.tif',
+}
+
+
+def image_extension(fh):
+    """Extension for the image format of fh, or '' if Pillow does not recognise one"""
+    try:
+        with Image.open(fh) as img:
+            image_format = img.format
+    except Exception:
+        return ''
+    finally:
+        fh.seek(0)
+    return IMAGE_EXTENSIONS.get(image_format, '')
+
+
+def store_content_addressed(storage, storage_name, content):
+    """Save content under its content-addressed name unless a copy is already there"""
+    if storage.exists(storage_name):
+        return
+    saved_name = storage.save(storage_name, content)
+    if saved_name != storage_name:
+        # A concurrent upload of the same content took the name first; the
+        # storage gave this copy an alternative name instead
+        storage.delete(saved_name)
+
+
+class ContentAddressedFile(UploadedFile):
+    """An upload staged on disk, to be stored under its content hash"""
+    
+    def __init__(self, storage_name, digest, **kwargs):
+        super().__init__(**kwargs)
+        self.storage_name = storage_name
+        self.digest = digest
+    
+    def temporary_file_path(self):
+        # Lets FileSystemStorage move the staging file instead of copying it
+        return self.file.name
+    
+    def store(self):
+        """Store the upload unless a copy is already there; call once its row has committed"""
+        store_content_addressed(kyc_storage(), self.storage_name, self)
+    
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # The staging file was moved into storage
+            pass
+
+
+class ContentAddressedUploadHandler(FileUploadHandler):
+    """Hash uploaded files into staging files while they stream in"""
+    chunk_size = 64 * 2 ** 10
+    
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_request_size = settings.KYC_MAX_REQUEST_SIZE
+        self.max_file_size = settings.KYC_MAX_UPLOAD_SIZE
+        self.rejected = False
+        self._temp_file = None
+    
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_request_size:
+            # Short-circuit the parser: nothing past the headers is read
+            self.rejected = True
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+    
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        # On the same filesystem as local storage, so storing is a rename;
+        # deleted when closed unless it was moved
+        incoming = os.path.join(settings.MEDIA_ROOT, CAS_DIRECTORY, '.incoming')
+        os.makedirs(incoming, exist_ok=True)
+        self._temp_file = NamedTemporaryFile(suffix='.upload', dir=incoming)
+        self._hash = hashlib.sha256()
+        self._size = 0
+    
+    def receive_data_chunk(self, raw_data, start):
+        self._size += len(raw_data)
+        if self._size > self.max_file_size:
+            self.rejected = True
+            self._discard()
+            raise StopUpload(connection_reset=True)
+        self._hash.update(raw_data)
+        self._temp_file.write(raw_data)
+        return None
+    
+    def file_complete(self, file_size):
+        upload = self._temp_file
+        self._temp_file = None
+        upload.flush()
+        upload.seek(0)
+        
+        digest = self._hash.hexdigest()
+        extension = image_extension(upload)
+        return ContentAddressedFile(
+            storage_name=f'{CAS_DIRECTORY}/{digest[:2]}/{digest[2:4]}/{digest}{extension}',
+            digest=digest,
+            file=upload,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+    
+    def upload_interrupted(self):
+        self._discard()
+    
+    def upload_complete(self):
+        self._discard()
+    
+    def _discard(self):
+        if self._temp_file is not None:
+            self._temp_file.close()
+            self._temp_file = None
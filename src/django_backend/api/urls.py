@@ -22,6 +22,7 @@ urlpatterns = [
     path('investments/my-investments/', views.my_investments_view, name='my_investments'),
     path('investments/create/', views.create_investment_view, name='create_investment'),
     path('investments/chart-data/', views.investment_chart_data_view, name='investment_chart_data'),
+    path('investments/projection/', views.investment_projection_view, name='investment_projection'),
     
     # Transactions
     path('transactions/', views.transactions_view, name='transactions'),
@@ -34,14 +35,18 @@ urlpatterns = [
     path('referrals/stats/', views.referral_stats_view, name='referral_stats'),
     path('referrals/packs/', views.referral_packs_view, name='referral_packs'),
     path('referrals/my-referrals/', views.my_referrals_view, name='my_referrals'),
+    path('referrals/downline/', views.downline_view, name='downline'),
+    path('referrals/downline/stats/', views.downline_stats_view, name='downline_stats'),
     
     # KYC
     path('kyc/submit/', views.submit_kyc_view, name='submit_kyc'),
     path('kyc/status/', views.kyc_status_view, name='kyc_status'),
+    path('media/kyc/<str:token>/', views.kyc_media_view, name='kyc_media'),
     
     # Messages
     path('messages/', views.messages_view, name='messages'),
     path('messages/send/', views.send_message_view, name='send_message'),
+    path('messages/summary/', views.inbox_summary_view, name='inbox_summary'),
     path('messages/mark-read/', views.mark_read_view, name='mark_read'),
     path('messages/submit-link/', views.submit_offer_link_view, name='submit_offer_link'),
     
@@ -51,9 +56,17 @@ urlpatterns = [
     path('admin/deposits/', views.admin_deposits_view, name='admin_deposits'),
     path('admin/withdrawals/', views.admin_withdrawals_view, name='admin_withdrawals'),
     path('admin/kyc/', views.admin_kyc_view, name='admin_kyc'),
+    path('admin/kyc/detail/', views.admin_kyc_detail_view, name='admin_kyc_detail'),
     path('admin/investments/', views.admin_investments_view, name='admin_investments'),
     path('admin/messages/', views.admin_messages_view, name='admin_messages'),
     path('admin/affiliates/', views.admin_affiliates_view, name='admin_affiliates'),
+    path('admin/affiliates/rank/', views.admin_affiliate_rank_view, name='admin_affiliate_rank'),
+    path('admin/reports/volumes/', views.admin_volume_report_view, name='admin_volume_report'),
+    path('admin/reports/projection/', views.admin_projection_view, name='admin_projection'),
+    path('admin/reports/liability/', views.admin_liability_report_view, name='admin_liability_report'),
+    path('admin/search/', views.admin_search_view, name='admin_search'),
+    path('admin/events/', views.admin_events_view, name='admin_events'),
+    path('admin/events/ack/', views.admin_events_ack_view, name='admin_events_ack'),
     
     # Admin Actions
     path('admin/transactions/approve/', views.approve_transaction_view, name='approve_transaction'),
@@ -0,0 +1,202 @@
+"""
+Per-user change versions for conditional GETs and cached responses.
+
+Every user has a version number in the shared cache that is bumped after
+any transaction that writes one of their rows commits (see USER_FIELDS);
+data shared by everyone's responses (investment and referral packs) has a
+catalog version of its own. Per-user read endpoints build their ETags
+(etag_per_user) and response cache keys (cached_per_user) from those
+numbers, so a client revalidating unchanged data gets 304 Not Modified
+without the view running a single query, and a write invalidates all of a
+user's cached responses in O(1) without finding or deleting any keys.
+
+Versions start from the current time in microseconds rather than 0, so a
+version lost from the cache (eviction, restart) can never come back at a
+value an old ETag or cache key was built from. Bumping a version also pins
+the user to the primary database for REPLICA_STICKY_SECONDS.
+
+Versions are only trustworthy when every process that writes (web workers
+and run_jobs) bumps them in the same cache. With a per-process cache (no
+REDIS_URL) the decorators pass requests straight to the view.
+"""
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.response import Response
+
+from .db_routers import SAFE_METHODS, pin_to_primary
+from .models import (
+    InvestmentPack, KYCVerification, Message, ReferralAchievement, ReferralCommission, ReferralPack,
+    Transaction, User, UserInvestment
+)
+
+# model -> fields holding the ids of users whose data a write changes
+USER_FIELDS = {
+    User: ['id', 'referred_by_id'],
+    Transaction: ['user_id'],
+    UserInvestment: ['user_id'],
+    KYCVerification: ['user_id'],
+    Message: ['sender_id', 'recipient_id'],
+    ReferralCommission: ['referrer_id', 'referred_user_id'],
+    ReferralAchievement: ['user_id'],
+}
+
+# Backends whose contents other processes cannot see
+PER_PROCESS_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+# Shared rows that appear inside per-user responses
+CATALOG_MODELS = [InvestmentPack, ReferralPack]
+CATALOG_VERSION_KEY = 'catalog-version'
+
+
+def versions_shared():
+    """Whether all processes see the same versions, so they can validate responses"""
+    return settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHES
+
+
+def _version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def _fresh_version():
+    return time.time_ns() // 1000
+
+
+def _versions(keys):
+    """Current version for each key, starting any that are missing"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def catalog_version():
+    """Current version of the investment and referral packs"""
+    return _versions([CATALOG_VERSION_KEY])[0]
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not cached: any fresh starting value is newer than the lost one
+            cache.add(key, _fresh_version(), timeout=None)
+
+
+def _bump_users(user_ids):
+    for user_id in user_ids:
+        # A replica still behind this write must not be served under the new
+        # version, or the stale response would be revalidated as current
+        pin_to_primary(user_id)
+    _bump([_version_key(user_id) for user_id in user_ids])
+
+
+def bump_user_versions(*user_ids):
+    """Invalidate the users' ETags and cached responses once the current transaction commits"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if user_ids:
+        transaction.on_commit(lambda: _bump_users(user_ids))
+
+
+def _on_write(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user_ids = [getattr(instance, field) for field in USER_FIELDS[sender]]
+    if sender is User and kwargs.get('created') and instance.referred_by_id:
+        # A signup changes the downline of every upline referrer
+        user_ids += instance.referral_ancestor_ids()
+    bump_user_versions(*user_ids)
+
+
+def _on_catalog_write(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: _bump([CATALOG_VERSION_KEY]))
+
+
+def connect_signals():
+    for model in USER_FIELDS:
+        post_save.connect(_on_write, sender=model, dispatch_uid=f'version-save-{model.__name__}')
+        post_delete.connect(_on_write, sender=model, dispatch_uid=f'version-delete-{model.__name__}')
+    for model in CATALOG_MODELS:
+        post_save.connect(_on_catalog_write, sender=model, dispatch_uid=f'version-save-{model.__name__}')
+        post_delete.connect(_on_catalog_write, sender=model, dispatch_uid=f'version-delete-{model.__name__}')
+
+
+def _variant(request, view_name):
+    """Identifies one response of a view for the user's current data"""
+    # Responses also depend on the URL and its representation, and some
+    # (chart data, projections) on today's date
+    variant = '|'.join([view_name, request.get_full_path(), request.META.get('HTTP_ACCEPT', '')])
+    digest = hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()[:12]
+    user, catalog = _versions([_version_key(request.user.id), CATALOG_VERSION_KEY])
+    return f'{request.user.id}-{user}-{catalog}-{date.today():%Y%m%d}-{digest}'
+
+
+def _matches(request, etag):
+    # Compression weakens ETags, so compare weakly
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    return '*' in candidates or etag.removeprefix('W/') in (c.removeprefix('W/') for c in candidates)
+
+
+def _applies(request):
+    return request.method in SAFE_METHODS and request.user.is_authenticated and versions_shared()
+
+
+def etag_per_user(view):
+    """ETag a per-user GET view by the user's version; 304 without running it"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not _applies(request):
+            return view(request, *args, **kwargs)
+        
+        etag = quote_etag(_variant(request, view.__name__))
+        if _matches(request, etag):
+            response = Response(status=304)
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapped
+
+
+def cached_per_user(view):
+    """Serve a per-user GET view's data from the cache until the user's version changes"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not _applies(request):
+            return view(request, *args, **kwargs)
+        
+        # The key is taken before the view reads anything, so data read
+        # before a concurrent write is only ever stored under the old version
+        key = f'user-cache:{_variant(request, view.__name__)}'
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'hit'
+            return response
+        
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.USER_CACHE_TTL)
+            response['X-Cache'] = 'miss'
+        return response
+    return wrapped
@@ -1,24 +1,82 @@
 from rest_framework import status, generics, viewsets
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import (
+    api_view, authentication_classes, permission_classes, throttle_classes, action
+)
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate
+from django.db import transaction
 from django.db.models import Sum, Count, Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
 from django.utils import timezone
 from datetime import timedelta, date
 from decimal import Decimal
+import time
 
 from .models import *
 from .serializers import *
+from .db_routers import read_from_replica
+from .filters import admin_list_queryset
+from .idempotency import idempotent
+from .jobs import enqueue
+from .kyc_images import schedule_processing
+from .projections import (
+    DEFAULT_DAYS, MAX_DAYS, grouped_rows, investment_summary, liability_report, payout_schedule
+)
+from .revocation import OptionalJWTAuthentication, revoke
+from .search import search
+from .storage import S3Storage, guess_content_type, kyc_storage, unsign_media_token
+from .throttling import (
+    DepositThrottle, LoginThrottle, SendMessageThrottle, SignupThrottle, WithdrawalThrottle
+)
+from .uploads import ContentAddressedUploadHandler
+from .versioning import bump_user_versions, cached_per_user, etag_per_user
 
 User = get_user_model()
 
 
+def _history_page(request, live, archive, live_serializer, archive_serializer):
+    """Page through the live table, continuing into the archive past its end"""
+    limit = request.query_params.get('limit')
+    if limit is None:
+        # Unpaginated clients still get the full history
+        return live_serializer(live, many=True).data + archive_serializer(archive, many=True).data
+    
+    limit = max(1, min(int(limit), 200))
+    offset = max(0, int(request.query_params.get('offset', 0)))
+    
+    live_rows = list(live[offset:offset + limit])
+    data = live_serializer(live_rows, many=True).data
+    if len(live_rows) < limit:
+        live_count = offset + len(live_rows) if live_rows else live.count()
+        archive_offset = max(0, offset - live_count)
+        archive_rows = archive[archive_offset:archive_offset + limit - len(live_rows)]
+        data += archive_serializer(archive_rows, many=True).data
+    return data
+
+
+def _admin_list(request, name, serializer_class):
+    """Filtered, sorted and optionally paginated admin list (see api/filters.py)"""
+    try:
+        queryset = admin_list_queryset(name, request.query_params)
+        limit = request.query_params.get('limit')
+        if limit is not None:
+            limit = max(1, min(int(limit), 500))
+            offset = max(0, int(request.query_params.get('offset', 0)))
+            queryset = queryset[offset:offset + limit]
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(serializer_class(queryset, many=True).data)
+
+
 # ==================== Authentication Views ====================
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([SignupThrottle])
 def signup_view(request):
     """User registration"""
     serializer = SignupSerializer(data=request.data)
@@ -32,6 +90,7 @@ def signup_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginThrottle])
 def login_view(request):
     """User login"""
     email = request.data.get('email')
@@ -60,14 +119,37 @@ def login_view(request):
 
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@authentication_classes([OptionalJWTAuthentication])
+@permission_classes([AllowAny])
 def logout_view(request):
-    """User logout"""
+    """User logout: revoke the given refresh token and the access token used, if still valid"""
+    # An expired access token must not stop the refresh token being revoked;
+    # holding a valid refresh token is enough to revoke it
+    refresh = None
+    if request.data.get('refresh'):
+        try:
+            refresh = RefreshToken(request.data['refresh'])
+        except TokenError:
+            pass
+        if refresh is None or (
+            request.user.is_authenticated
+            and str(refresh.get(settings.SIMPLE_JWT['USER_ID_CLAIM'])) != str(request.user.id)
+        ):
+            return Response({'detail': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+    elif not request.user.is_authenticated:
+        return Response({'detail': 'Provide a refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if refresh is not None:
+        revoke(refresh)
+    if request.auth is not None:
+        revoke(request.auth)
     return Response({'message': 'Logged out successfully'})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
+@cached_per_user
 def user_profile_view(request):
     """Get user profile"""
     serializer = UserSerializer(request.user)
@@ -87,6 +169,9 @@ def update_profile_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
+@cached_per_user
+@read_from_replica
 def user_stats_view(request):
     """Get user dashboard statistics"""
     user = request.user
@@ -138,6 +223,7 @@ def investment_packs_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
 def my_investments_view(request):
     """Get user's investments"""
     investments = UserInvestment.objects.filter(user=request.user)
@@ -147,6 +233,7 @@ def my_investments_view(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_investment_view(request):
     """Create new investment"""
     pack_id = request.data.get('pack_id')
@@ -167,38 +254,21 @@ def create_investment_view(request):
     if request.user.balance < amount:
         return Response({'detail': 'Insufficient balance'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Create investment
-    investment = UserInvestment.objects.create(
-        user=request.user,
-        pack=pack,
-        amount=amount
-    )
-    
-    # Deduct from balance
-    request.user.balance -= amount
-    request.user.save()
-    
-    # Process referral commission if applicable
-    if request.user.referred_by:
-        commission_amount = amount * Decimal('0.03')  # 3% commission
-        request.user.referred_by.balance += commission_amount
-        request.user.referred_by.save()
-        
-        # Record commission
-        ReferralCommission.objects.create(
-            referrer=request.user.referred_by,
-            referred_user=request.user,
-            amount=commission_amount,
-            investment=investment
+    with transaction.atomic():
+        # Create investment
+        investment = UserInvestment.objects.create(
+            user=request.user,
+            pack=pack,
+            amount=amount
         )
         
-        # Create transaction record
-        Transaction.objects.create(
-            user=request.user.referred_by,
-            type='referral_commission',
-            amount=commission_amount,
-            status='completed'
-        )
+        # Deduct from balance
+        request.user.balance -= amount
+        request.user.save()
+        
+        # Referral commission is paid by a background job
+        if request.user.referred_by_id:
+            enqueue('referral_commission', investment_id=investment.id)
     
     serializer = UserInvestmentSerializer(investment)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -206,6 +276,8 @@ def create_investment_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
+@read_from_replica
 def investment_chart_data_view(request):
     """Get investment chart data"""
     investments = UserInvestment.objects.filter(
@@ -227,19 +299,62 @@ def investment_chart_data_view(request):
     return Response(chart_data)
 
 
+def _projection_days(request):
+    """Validated ?days= for the projection endpoints, or None"""
+    try:
+        days = int(request.query_params.get('days', DEFAULT_DAYS))
+    except ValueError:
+        return None
+    return days if 1 <= days <= MAX_DAYS else None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@etag_per_user
+@read_from_replica
+def investment_projection_view(request):
+    """Upcoming daily payouts and maturities of the user's active investments"""
+    days = _projection_days(request)
+    if days is None:
+        return Response({'detail': f'days must be between 1 and {MAX_DAYS}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    today = date.today()
+    investments = list(
+        UserInvestment.objects.filter(user=request.user, status='active')
+        .select_related('pack').order_by('end_date', 'id')
+    )
+    projection = payout_schedule(
+        [(inv.daily_return, inv.start_date, inv.end_date, inv.amount) for inv in investments],
+        start=today + timedelta(days=1), days=days
+    )
+    projection['investments'] = [investment_summary(inv, today) for inv in investments]
+    return Response(projection)
+
+
 # ==================== Transaction Views ====================
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
 def transactions_view(request):
-    """Get user's transactions"""
-    transactions = Transaction.objects.filter(user=request.user)
-    serializer = TransactionSerializer(transactions, many=True)
-    return Response(serializer.data)
+    """Get user's transactions, paging into the archive with limit/offset"""
+    try:
+        data = _history_page(
+            request,
+            Transaction.objects.filter(user=request.user),
+            ArchivedTransaction.objects.filter(user=request.user),
+            TransactionSerializer,
+            ArchivedTransactionSerializer
+        )
+    except ValueError:
+        return Response({'detail': 'Invalid pagination'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([DepositThrottle])
+@idempotent
 def deposit_view(request):
     """Create deposit request"""
     amount = request.data.get('amount')
@@ -261,6 +376,8 @@ def deposit_view(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([WithdrawalThrottle])
+@idempotent
 def withdrawal_view(request):
     """Create withdrawal request"""
     amount = Decimal(str(request.data.get('amount', 0)))
@@ -292,28 +409,20 @@ def withdrawal_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
+@cached_per_user
 def referral_stats_view(request):
     """Get referral statistics"""
     user = request.user
     
-    referrals = ReferralCommission.objects.filter(referrer=user)
-    total_referrals = referrals.count()
-    total_commission = referrals.aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Get referral packs and check achievement
-    referral_packs = ReferralPack.objects.all()
-    packs_progress = []
-    
-    for pack in referral_packs:
-        packs_progress.append({
-            'pack': ReferralPackSerializer(pack).data,
-            'achieved': total_referrals >= pack.required_referrals
-        })
+    stats = AffiliateStats.objects.filter(user=user).first()
+    achieved = set(ReferralAchievement.objects.filter(user=user).values_list('pack_id', flat=True))
+    packs = ReferralPackSerializer(ReferralPack.objects.all(), many=True).data
     
     return Response({
-        'total_referrals': total_referrals,
-        'total_commission': float(total_commission),
-        'packs': packs_progress
+        'total_referrals': stats.referral_count if stats else 0,
+        'total_commission': float(stats.total_commission) if stats else 0,
+        'packs': [{'pack': pack, 'achieved': pack['id'] in achieved} for pack in packs]
     })
 
 
@@ -328,6 +437,8 @@ def referral_packs_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
+@cached_per_user
 def my_referrals_view(request):
     """Get user's referrals"""
     referrals = ReferralCommission.objects.filter(referrer=request.user)
@@ -335,6 +446,54 @@ def my_referrals_view(request):
     return Response(serializer.data)
 
 
+def _downline_root(request):
+    """The requesting user, or any user_id when the requester is an admin"""
+    user_id = request.query_params.get('user_id')
+    if user_id is None or request.user.role != 'admin':
+        return request.user
+    return User.objects.get(id=user_id)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def downline_view(request):
+    """List the referral subtree, optionally limited to max_depth levels"""
+    try:
+        root = _downline_root(request)
+        max_depth = request.query_params.get('max_depth')
+        max_depth = int(max_depth) if max_depth else None
+        limit = max(1, min(int(request.query_params.get('limit', 100)), 500))
+        offset = max(0, int(request.query_params.get('offset', 0)))
+    except (User.DoesNotExist, ValueError):
+        return Response({'detail': 'Invalid parameters'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    members = root.downline(max_depth).order_by('referral_path', 'id')[offset:offset + limit]
+    serializer = DownlineUserSerializer(members, many=True, context={'root_depth': root.referral_depth})
+    return Response({
+        'count': root.downline_count,
+        'results': serializer.data
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def downline_stats_view(request):
+    """Downline size in total and per level"""
+    try:
+        root = _downline_root(request)
+    except (User.DoesNotExist, ValueError):
+        return Response({'detail': 'Invalid parameters'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    levels = root.downline().values('referral_depth').annotate(count=Count('id')).order_by('referral_depth')
+    return Response({
+        'total': root.downline_count,
+        'by_level': [
+            {'level': row['referral_depth'] - root.referral_depth, 'count': row['count']}
+            for row in levels
+        ]
+    })
+
+
 # ==================== KYC Views ====================
 
 @api_view(['POST'])
@@ -348,9 +507,20 @@ def submit_kyc_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    serializer = KYCVerificationSerializer(data=request.data)
+    # Must be installed before request.data is first touched
+    upload_handler = ContentAddressedUploadHandler(request)
+    request.upload_handlers = [upload_handler]
+    data = request.data
+    if upload_handler.rejected:
+        return Response(
+            {'detail': 'Upload too large'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+    
+    serializer = KYCVerificationSerializer(data=data)
     if serializer.is_valid():
-        serializer.save(user=request.user)
+        kyc = serializer.save(user=request.user)
+        schedule_processing(kyc.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -367,21 +537,58 @@ def kyc_status_view(request):
         return Response({'status': 'not_submitted'})
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def kyc_media_view(request, token):
+    """Hand a signed KYC image link off to the web server or object store"""
+    name = unsign_media_token(token)
+    if name is None:
+        return Response({'detail': 'Link expired or invalid'}, status=status.HTTP_403_FORBIDDEN)
+    
+    storage = kyc_storage()
+    if isinstance(storage, S3Storage):
+        return HttpResponseRedirect(storage.url(name))
+    
+    sendfile = settings.KYC_MEDIA_SENDFILE
+    if sendfile == 'x-accel-redirect':
+        response = HttpResponse(content_type=guess_content_type(name))
+        response['X-Accel-Redirect'] = settings.KYC_MEDIA_ACCEL_PREFIX + name
+    elif sendfile == 'x-sendfile':
+        response = HttpResponse(content_type=guess_content_type(name))
+        response['X-Sendfile'] = storage.path(name)
+    else:
+        # Development only: bytes stream through the Python worker
+        try:
+            response = FileResponse(storage.open(name), content_type=guess_content_type(name))
+        except FileNotFoundError:
+            raise Http404
+    response['Cache-Control'] = 'private, max-age=%d' % settings.KYC_MEDIA_URL_TTL
+    return response
+
+
 # ==================== Message Views ====================
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@etag_per_user
 def messages_view(request):
-    """Get user's messages"""
-    messages = Message.objects.filter(
-        Q(sender=request.user) | Q(recipient=request.user)
-    )
-    serializer = MessageSerializer(messages, many=True)
-    return Response(serializer.data)
+    """Get user's messages, paging into the archive with limit/offset"""
+    try:
+        data = _history_page(
+            request,
+            Message.objects.filter(Q(sender=request.user) | Q(recipient=request.user)),
+            ArchivedMessage.objects.filter(Q(sender=request.user) | Q(recipient=request.user)),
+            MessageSerializer,
+            ArchivedMessageSerializer
+        )
+    except ValueError:
+        return Response({'detail': 'Invalid pagination'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([SendMessageThrottle])
 def send_message_view(request):
     """Send message"""
     recipient_id = request.data.get('recipient_id')
@@ -393,24 +600,67 @@ def send_message_view(request):
     
     serializer = MessageSerializer(data=request.data)
     if serializer.is_valid():
+        # Message.save counts it towards the recipient's unread badge
         serializer.save(sender=request.user, recipient=recipient)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def inbox_summary_view(request):
+    """Get unread message count for the badge"""
+    return Response({'unread_count': InboxCounter.unread_for(request.user.id)})
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_read_view(request):
-    """Mark message as read"""
+    """Mark one message, a list of messages or everything up to an id as read"""
     message_id = request.data.get('message_id')
+    message_ids = request.data.get('message_ids')
+    up_to_id = request.data.get('up_to_id')
     
+    if message_ids is not None and not isinstance(message_ids, list):
+        return Response({'detail': 'message_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        message = Message.objects.get(id=message_id, recipient=request.user)
-        message.is_read = True
-        message.save()
-        return Response({'message': 'Marked as read'})
-    except Message.DoesNotExist:
-        return Response({'detail': 'Message not found'}, status=status.HTTP_404_NOT_FOUND)
+        message_id = int(message_id) if message_id is not None else None
+        message_ids = [int(i) for i in message_ids] if message_ids is not None else None
+        up_to_id = int(up_to_id) if up_to_id is not None else None
+    except (TypeError, ValueError):
+        return Response({'detail': 'Message ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    unread = Message.objects.filter(recipient=request.user, is_read=False)
+    if message_id is not None:
+        unread = unread.filter(id=message_id)
+    elif message_ids is not None:
+        unread = unread.filter(id__in=message_ids)
+    elif up_to_id is not None:
+        unread = unread.filter(id__lte=up_to_id)
+    else:
+        return Response(
+            {'detail': 'Provide message_id, message_ids or up_to_id'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Single UPDATE; the row count keeps the counter in step, and both
+    # commit together
+    with transaction.atomic():
+        updated = unread.update(is_read=True)
+        InboxCounter.adjust(request.user.id, -updated)
+    if updated:
+        # A bulk UPDATE sends no post_save signals
+        bump_user_versions(request.user.id)
+    
+    if message_id is not None and not updated:
+        if not Message.objects.filter(id=message_id, recipient=request.user).exists():
+            return Response({'detail': 'Message not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'message': 'Marked as read',
+        'updated': updated,
+        'unread_count': InboxCounter.unread_for(request.user.id)
+    })
 
 
 @api_view(['POST'])
@@ -436,6 +686,7 @@ def submit_offer_link_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_stats_view(request):
     """Get admin dashboard statistics"""
     if request.user.role != 'admin':
@@ -451,10 +702,12 @@ def admin_stats_view(request):
         total=Sum('balance')
     )['total'] or 0
     
-    total_earnings = Transaction.objects.filter(
-        type='earning',
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    # Exact, unlike the rollups, which user deletion does not reach; includes
+    # what archive_history has moved out of the hot table
+    total_earnings = sum(
+        model.objects.filter(type='earning', status='completed').aggregate(total=Sum('amount'))['total'] or 0
+        for model in (Transaction, ArchivedTransaction)
+    )
     
     recent_users = User.objects.filter(role='customer').order_by('-created_at')[:5]
     
@@ -472,66 +725,79 @@ def admin_stats_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_users_view(request):
     """Get all users (admin only)"""
     if request.user.role != 'admin':
         return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    users = User.objects.filter(role='customer')
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    return _admin_list(request, 'users', UserSerializer)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_deposits_view(request):
     """Get all deposit requests (admin only)"""
     if request.user.role != 'admin':
         return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    deposits = Transaction.objects.filter(type='deposit')
-    serializer = TransactionSerializer(deposits, many=True)
-    return Response(serializer.data)
+    return _admin_list(request, 'deposits', TransactionSerializer)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_withdrawals_view(request):
     """Get all withdrawal requests (admin only)"""
     if request.user.role != 'admin':
         return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    withdrawals = Transaction.objects.filter(type='withdrawal')
-    serializer = TransactionSerializer(withdrawals, many=True)
-    return Response(serializer.data)
+    return _admin_list(request, 'withdrawals', TransactionSerializer)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_kyc_view(request):
     """Get all KYC submissions (admin only)"""
     if request.user.role != 'admin':
         return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    kyc_submissions = KYCVerification.objects.all()
-    serializer = KYCVerificationSerializer(kyc_submissions, many=True)
+    return _admin_list(request, 'kyc', KYCAdminListSerializer)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def admin_kyc_detail_view(request):
+    """Get a single KYC submission with full-size images (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    try:
+        kyc = KYCVerification.objects.get(id=request.query_params.get('kyc_id'))
+    except (KYCVerification.DoesNotExist, ValueError):
+        return Response({'detail': 'KYC not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = KYCVerificationSerializer(kyc)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_investments_view(request):
     """Get all investments (admin only)"""
     if request.user.role != 'admin':
         return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    investments = UserInvestment.objects.all()
-    serializer = UserInvestmentSerializer(investments, many=True)
-    return Response(serializer.data)
+    return _admin_list(request, 'investments', UserInvestmentSerializer)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_messages_view(request):
     """Get all messages (admin only)"""
     if request.user.role != 'admin':
@@ -544,30 +810,213 @@ def admin_messages_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def admin_affiliates_view(request):
-    """Get affiliate statistics (admin only)"""
+    """Get top affiliates by commission or referral count (admin only)"""
     if request.user.role != 'admin':
         return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
-    # Get users with referrals
-    users_with_referrals = User.objects.filter(
-        commissions_earned__isnull=False
-    ).distinct().annotate(
-        referral_count=Count('commissions_earned'),
-        total_commission=Sum('commissions_earned__amount')
-    )
+    ranking = request.query_params.get('sort', 'commission')
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 100)), 500))
+        offset = max(0, int(request.query_params.get('offset', 0)))
+    except ValueError:
+        return Response({'detail': 'Invalid pagination'}, status=status.HTTP_400_BAD_REQUEST)
+    if ranking not in AffiliateStats.RANKINGS:
+        return Response({'detail': 'Invalid sort'}, status=status.HTTP_400_BAD_REQUEST)
     
     data = []
-    for user in users_with_referrals:
+    for rank, stats in enumerate(AffiliateStats.ranked(ranking)[offset:offset + limit], start=offset + 1):
         data.append({
-            'user': UserSerializer(user).data,
-            'referral_count': user.referral_count,
-            'total_commission': float(user.total_commission or 0)
+            'rank': rank,
+            'user': UserSerializer(stats.user).data,
+            'referral_count': stats.referral_count,
+            'total_commission': float(stats.total_commission)
         })
     
     return Response(data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def admin_affiliate_rank_view(request):
+    """Get one affiliate's rank (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    ranking = request.query_params.get('sort', 'commission')
+    if ranking not in AffiliateStats.RANKINGS:
+        return Response({'detail': 'Invalid sort'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        stats = AffiliateStats.objects.get(user_id=request.query_params.get('user_id'))
+    except (AffiliateStats.DoesNotExist, ValueError):
+        return Response({'detail': 'Affiliate not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'user_id': stats.user_id,
+        'rank': stats.rank(ranking),
+        'referral_count': stats.referral_count,
+        'total_commission': float(stats.total_commission)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def admin_volume_report_view(request):
+    """Deposit, withdrawal, earning, commission and investment volumes per bucket (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    params = request.query_params
+    period = params.get('period', 'day')
+    if period not in dict(ReportRollup.PERIOD_CHOICES):
+        return Response({'detail': 'Invalid period'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rollups = ReportRollup.objects.filter(period=period)
+    try:
+        if params.get('start'):
+            rollups = rollups.filter(bucket__gte=date.fromisoformat(params['start']))
+        if params.get('end'):
+            rollups = rollups.filter(bucket__lte=date.fromisoformat(params['end']))
+        if params.get('pack'):
+            rollups = rollups.filter(pack_key=int(params['pack']))
+    except ValueError:
+        return Response({'detail': 'Invalid filter'}, status=status.HTTP_400_BAD_REQUEST)
+    if params.get('kind'):
+        rollups = rollups.filter(kind=params['kind'])
+    if params.get('status'):
+        rollups = rollups.filter(status=params['status'])
+    
+    rows = rollups.exclude(count=0).order_by('bucket', 'kind', 'status', 'pack_key')
+    return Response([{
+        'bucket': row.bucket.isoformat(),
+        'kind': row.kind,
+        'status': row.status,
+        'pack': row.pack_key or None,
+        'count': row.count,
+        'amount': float(row.amount)
+    } for row in rows])
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def admin_projection_view(request):
+    """Upcoming daily payouts across all active investments, or one user's (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    days = _projection_days(request)
+    if days is None:
+        return Response({'detail': f'days must be between 1 and {MAX_DAYS}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    today = date.today()
+    investments = UserInvestment.objects.filter(status='active', end_date__gt=today)
+    user_id = request.query_params.get('user_id')
+    if user_id:
+        if not user_id.isdigit():
+            return Response({'detail': 'Invalid user_id'}, status=status.HTTP_400_BAD_REQUEST)
+        investments = investments.filter(user_id=int(user_id))
+    
+    projection = payout_schedule(grouped_rows(investments), start=today + timedelta(days=1), days=days)
+    return Response(projection)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+def admin_liability_report_view(request):
+    """Outstanding customer obligations and upcoming daily payouts (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    days = _projection_days(request)
+    if days is None:
+        return Response({'detail': f'days must be between 1 and {MAX_DAYS}'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(liability_report(days))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_search_view(request):
+    """Ranked full-text search over users, transactions and messages (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    text = request.query_params.get('q', '').strip()
+    kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+    valid_kinds = {kind for kind, _ in SearchDocument.KIND_CHOICES}
+    if not set(kinds) <= valid_kinds:
+        return Response({'detail': 'Invalid kind'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        offset = max(0, int(request.query_params.get('offset', 0)))
+        started = time.perf_counter()
+        results = search(text, kinds=kinds, limit=limit, offset=offset)
+    except ValueError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def admin_events_view(request):
+    """Read domain events in id order after a cursor (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    consumer = request.query_params.get('consumer')
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 500)), 1000))
+    except ValueError:
+        return Response({'detail': 'Invalid pagination'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        if 'after' in request.query_params:
+            after = int(request.query_params['after'])
+        else:
+            after = EventCursor.position_for(consumer) if consumer else 0
+    except ValueError:
+        return Response({'detail': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    events = DomainEvent.visible().filter(id__gt=after)
+    types = request.query_params.get('type')
+    if types:
+        events = events.filter(type__in=types.split(','))
+    batch = list(events.order_by('id')[:limit])
+    
+    return Response({
+        'events': DomainEventSerializer(batch, many=True).data,
+        'next_cursor': batch[-1].id if batch else after,
+        'has_more': len(batch) == limit,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def admin_events_ack_view(request):
+    """Store a consumer's cursor after it processed events (admin only)"""
+    if request.user.role != 'admin':
+        return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    consumer = request.data.get('consumer')
+    try:
+        position = int(request.data.get('position'))
+    except (TypeError, ValueError):
+        return Response({'detail': 'Invalid position'}, status=status.HTTP_400_BAD_REQUEST)
+    if not consumer:
+        return Response({'detail': 'consumer is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    EventCursor.advance(consumer, position)
+    return Response({'consumer': consumer, 'position': EventCursor.position_for(consumer)})
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def approve_transaction_view(request):
@@ -589,6 +1038,12 @@ def approve_transaction_view(request):
         transaction.status = 'approved'
         transaction.admin_note = admin_note
         transaction.save()
+        enqueue(
+            'notify_user',
+            user_id=transaction.user_id,
+            subject=f'Your {transaction.type} was approved',
+            message=f'Your {transaction.type} of {transaction.amount} USDT was approved.'
+        )
         
         serializer = TransactionSerializer(transaction)
         return Response(serializer.data)
@@ -617,6 +1072,12 @@ def reject_transaction_view(request):
         transaction.status = 'rejected'
         transaction.admin_note = admin_note
         transaction.save()
+        enqueue(
+            'notify_user',
+            user_id=transaction.user_id,
+            subject=f'Your {transaction.type} was rejected',
+            message=f'Your {transaction.type} of {transaction.amount} USDT was rejected. {admin_note}'.strip()
+        )
         
         serializer = TransactionSerializer(transaction)
         return Response(serializer.data)
@@ -644,6 +1105,12 @@ def approve_kyc_view(request):
         # Update user
         kyc.user.is_kyc_verified = True
         kyc.user.save()
+        enqueue(
+            'notify_user',
+            user_id=kyc.user_id,
+            subject='Your identity verification was approved',
+            message='Your KYC documents were reviewed and approved.'
+        )
         
         serializer = KYCVerificationSerializer(kyc)
         return Response(serializer.data)
@@ -667,6 +1134,12 @@ def reject_kyc_view(request):
         kyc.admin_note = admin_note
         kyc.reviewed_at = timezone.now()
         kyc.save()
+        enqueue(
+            'notify_user',
+            user_id=kyc.user_id,
+            subject='Your identity verification was rejected',
+            message=f'Your KYC documents were rejected. {admin_note}'.strip()
+        )
         
         serializer = KYCVerificationSerializer(kyc)
         return Response(serializer.data)
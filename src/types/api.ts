@@ -80,7 +80,7 @@ export interface UserInvestment {
 export interface Transaction {
   id: number;
   user: number;
-  type: 'deposit' | 'withdrawal' | 'earning' | 'referral_commission';
+  type: 'deposit' | 'withdrawal' | 'earning' | 'referral_commission' | 'referral_reward';
   amount: number;
   status: 'pending' | 'approved' | 'rejected' | 'completed';
   wallet_address?: string;